@@ -1,60 +1,807 @@
 import os
 import hashlib
+import sqlite3
 import sys
+import time
+import json
+import struct
+import shutil
+import tempfile
+import argparse
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    # Opsional: hash non-kriptografis yang jauh lebih cepat (pip install xxhash)
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import fcntl # untuk reflink (ioctl FICLONE), hanya ada di Unix
+except ImportError:
+    fcntl = None
+
+try:
+    # Opsional: mode --similar (pip install pillow numpy)
+    from PIL import Image
+    import numpy as np
+except ImportError:
+    Image = None
+    np = None
 
 # ========================================
 # DUPLICATE FILE FINDER & CLEANER - DAY 14
 # Detect & Remove Duplicates by Content
 # ========================================
 
-def get_file_hash(filepath, block_size=65536):
+PARTIAL_SIZE = 4096 # byte awal & akhir yang di-hash di tahap partial hash
+READ_SIZE = 1024 * 1024 # blok baca untuk full hash (besar = lebih sedikit syscall)
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".duplicate_finder_cache.db")
+CACHE_VERSION = 2
+DEFAULT_ALGORITHM = 'blake2b'
+DEFAULT_WORKERS = 4 # jumlah file yang dibaca bersamaan
+JOURNAL_PATH = os.path.join(os.path.expanduser("~"), ".duplicate_finder_journal.jsonl")
+TMP_SUFFIX = ".dupfinder-tmp"
+FICLONE = 0x40049409 # ioctl Linux: clone isi file (btrfs, XFS, ...)
+COMPARE_MAX = 3 # grup kandidat sekecil ini dibandingkan byte per byte, bukan di-hash
+STREAM_BATCH = 1000 # mode --stream: jumlah kandidat yang di-hash per batch
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+HASH_SIZE = 8 # perceptual hash 8x8 = 64 bit
+DEFAULT_DISTANCE = 6 # maksimal bit berbeda agar dua gambar dianggap mirip
+CHUNK_AVG = 8192 # mode --chunks: rata-rata ukuran blok (min = /4, max = x8)
+SHARE_LIMIT = 16 # blok yang ada di lebih banyak file tidak dihitung per pasangan
+TOP_PAIRS = 20 # jumlah pasangan file yang ditampilkan di laporan blok
+CHUNK_RECORD = struct.Struct('<16sI') # hash blok 128-bit + ukuran, hasil worker --chunks
+CHUNK_BATCH = 65536 # jumlah record yang dibaca balik sekaligus
+
+# Tabel Gear: 256 angka 64-bit acak tapi tetap (sama di setiap run & proses)
+GEAR = [int.from_bytes(hashlib.blake2b(bytes([i]), digest_size=8).digest(), 'big') for i in range(256)]
+
+def available_algorithms():
+    algorithms = ['blake2b', 'md5', 'sha1']
+    if xxhash is not None:
+        algorithms.append('xxhash')
+    return algorithms
+
+def new_hasher(algorithm=DEFAULT_ALGORITHM):
+    if algorithm == 'xxhash':
+        if xxhash is None:
+            raise ValueError("xxhash belum terinstall (pip install xxhash)")
+        return xxhash.xxh3_128()
+    if algorithm == 'blake2b':
+        return hashlib.blake2b(digest_size=20)
+    return hashlib.new(algorithm)
+
+class HashCache:
+    """
+    Cache hash di SQLite: (path, size, mtime_ns, inode) -> partial/full hash.
+    Selama ukuran, waktu modifikasi dan inode file tidak berubah, hash
+    diambil dari cache tanpa membaca file sama sekali. Hasil compare_files
+    untuk grup kecil juga disimpan (termasuk "semua beda"), dengan kunci
+    metadata semua anggota grup.
+    """
+
+    def __init__(self, db_path=CACHE_PATH):
+        self.algorithm = DEFAULT_ALGORITHM # diset oleh scan_directory
+        self.conn = sqlite3.connect(db_path)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != CACHE_VERSION:
+            # Format lama: buang saja, isinya cuma cache
+            self.conn.execute("DROP TABLE IF EXISTS hashes")
+            self.conn.execute("DROP TABLE IF EXISTS compared")
+            self.conn.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS hashes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                algorithm TEXT NOT NULL,
+                partial TEXT,
+                full TEXT
+            )""")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS compared (
+                group_key TEXT PRIMARY KEY,
+                first_path TEXT NOT NULL,
+                result TEXT NOT NULL
+            )""")
+        self.hits = 0
+        self.misses = 0
+        self.used_groups = set() # group_key yang masih berlaku di scan ini (untuk prune)
+
+    def get(self, filepath, meta, kind):
+        """Hash tersimpan ('partial' / 'full') jika metadata file masih sama, else None."""
+        row = self.conn.execute(
+            f"SELECT size, mtime_ns, inode, algorithm, {kind} FROM hashes WHERE path = ?",
+            (os.path.abspath(filepath),)).fetchone()
+        if row is None or tuple(row[:4]) != meta + (self.algorithm,) or row[4] is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[4]
+
+    def put(self, filepath, meta, kind, value):
+        path = os.path.abspath(filepath)
+        row = self.conn.execute("SELECT size, mtime_ns, inode, algorithm FROM hashes WHERE path = ?",
+                                (path,)).fetchone()
+        if row is None or tuple(row) != meta + (self.algorithm,):
+            # File baru, sudah berubah, atau algoritma lain: hash lama tidak berlaku
+            self.conn.execute("INSERT OR REPLACE INTO hashes (path, size, mtime_ns, inode, algorithm) "
+                              "VALUES (?, ?, ?, ?, ?)", (path,) + meta + (self.algorithm,))
+        self.conn.execute(f"UPDATE hashes SET {kind} = ? WHERE path = ?", (value, path))
+
+    def _group_key(self, group, metas):
+        members = sorted((os.path.abspath(path),) + tuple(metas[path]) for path in group)
+        key = hashlib.blake2b(json.dumps([self.algorithm, members]).encode('utf-8'), digest_size=16).hexdigest()
+        return key, members[0][0]
+
+    def get_compared(self, group, metas):
+        """
+        Hasil compare_files tersimpan untuk grup ini ({path: hash atau None
+        jika isinya beda sendiri}), atau None jika ada anggota yang berubah.
+        """
+        key, _ = self._group_key(group, metas)
+        self.used_groups.add(key)
+        row = self.conn.execute("SELECT result FROM compared WHERE group_key = ?", (key,)).fetchone()
+        if row is None:
+            return None # miss dihitung oleh get() untuk full hash anggotanya
+        self.hits += len(group)
+        hashes = json.loads(row[0])
+        return {path: hashes.get(os.path.abspath(path)) for path in group}
+
+    def put_compared(self, group, metas, results):
+        key, first_path = self._group_key(group, metas)
+        self.used_groups.add(key)
+        hashes = {os.path.abspath(path): value for path, value in results.items()}
+        self.conn.execute("INSERT OR REPLACE INTO compared VALUES (?, ?, ?)",
+                          (key, first_path, json.dumps(hashes)))
+
+    def prune(self, folder_path, metas):
+        """
+        Hapus entri di bawah folder_path yang filenya sudah tidak ada atau
+        sudah berubah. metas = {path: (size, mtime_ns, inode)} hasil scan.
+        """
+        root = os.path.join(os.path.abspath(folder_path), '')
+        current = {os.path.abspath(path): meta for path, meta in metas.items()}
+        # Range query pada primary key = semua path yang diawali root
+        rows = self.conn.execute(
+            "SELECT path, size, mtime_ns, inode FROM hashes WHERE path >= ? AND path < ?",
+            (root, root[:-1] + chr(ord(root[-1]) + 1)))
+        stale = [(row[0],) for row in rows if current.get(row[0]) != tuple(row[1:])]
+        self.conn.executemany("DELETE FROM hashes WHERE path = ?", stale)
+        # Grup yang tidak dipakai lagi di scan ini (anggotanya berubah / hilang)
+        rows = self.conn.execute(
+            "SELECT group_key FROM compared WHERE first_path >= ? AND first_path < ?",
+            (root, root[:-1] + chr(ord(root[-1]) + 1)))
+        unused = [(row[0],) for row in rows if row[0] not in self.used_groups]
+        self.conn.executemany("DELETE FROM compared WHERE group_key = ?", unused)
+        return len(stale) + len(unused)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+def get_file_hash(filepath, block_size=READ_SIZE, algorithm=DEFAULT_ALGORITHM):
+    """
+    Menghitung hash dari file (default blake2b, lihat available_algorithms()).
+    Membaca file dalam blok-blok agar hemat RAM untuk file besar; buffer
+    dipakai ulang dengan readinto supaya tidak alokasi baru tiap blok.
+    """
+    hasher = new_hasher(algorithm)
+    buf = bytearray(block_size)
+    view = memoryview(buf)
+    try:
+        with open(filepath, 'rb', buffering=0) as f:
+            n = f.readinto(buf)
+            while n:
+                hasher.update(view[:n])
+                n = f.readinto(buf)
+        return hasher.hexdigest()
+    except (OSError, IOError) as e:
+        print(f"[ERROR] Tidak bisa membaca file {filepath}: {e}")
+        return None
+
+def compare_files(paths, algorithm=DEFAULT_ALGORITHM, block_size=READ_SIZE):
     """
-    Menghitung MD5 hash dari file.
-    Membaca file dalam blok-blok kecil agar hemat RAM untuk file besar.
+    Bandingkan isi beberapa file berukuran sama secara lockstep: blok yang
+    sama dibaca dari semua file, grup langsung dipecah begitu ada byte yang
+    beda, dan file yang tinggal sendirian berhenti dibaca. Blok dari tiap
+    grup ikut di-hash sambil jalan, jadi file yang identik sampai akhir
+    mendapat hash yang sama persis dengan get_file_hash.
+    Mengembalikan ({path: hash} untuk file yang punya kembaran, byte yang dibaca).
     """
-    hasher = hashlib.md5()
+    results = {}
+    bytes_read = 0
+    handles = {}
+    try:
+        for filepath in paths:
+            try:
+                handles[filepath] = open(filepath, 'rb', buffering=0)
+            except (OSError, IOError) as e:
+                print(f"[ERROR] Tidak bisa membaca file {filepath}: {e}")
+        groups = [(new_hasher(algorithm), list(handles))] if len(handles) > 1 else []
+        while groups:
+            next_groups = []
+            for hasher, members in groups:
+                blocks = {}
+                for filepath in members:
+                    try:
+                        blocks[filepath] = handles[filepath].read(block_size)
+                    except (OSError, IOError) as e:
+                        print(f"[ERROR] Tidak bisa membaca file {filepath}: {e}")
+                        continue
+                    bytes_read += len(blocks[filepath])
+                subgroups = group_by(members, blocks.get)
+                for i, group in enumerate(subgroups):
+                    # Grup terakhir memakai hasher asli, sisanya salinan state sebelum blok ini
+                    group_hasher = hasher if i == len(subgroups) - 1 else hasher.copy()
+                    block = blocks[group[0]]
+                    if not block:
+                        # Semua sampai EOF bersamaan: isinya identik
+                        digest = group_hasher.hexdigest()
+                        for filepath in group:
+                            results[filepath] = digest
+                        continue
+                    group_hasher.update(block)
+                    next_groups.append((group_hasher, group))
+            groups = next_groups
+    finally:
+        for f in handles.values():
+            f.close()
+    return results, bytes_read
+
+def get_partial_hash(filepath, file_size, chunk_size=PARTIAL_SIZE, algorithm=DEFAULT_ALGORITHM):
+    """
+    Hash cepat dari potongan awal dan akhir file saja.
+    File yang beda isi biasanya sudah beda di header atau di ekor file,
+    jadi cukup baca beberapa KB untuk menyaring kandidat duplikat.
+    """
+    hasher = new_hasher(algorithm)
     try:
         with open(filepath, 'rb') as f:
-            buf = f.read(block_size)
-            while len(buf) > 0:
-                hasher.update(buf)
-                buf = f.read(block_size)
+            hasher.update(f.read(chunk_size))
+            if file_size > 2 * chunk_size:
+                f.seek(file_size - chunk_size)
+            hasher.update(f.read(chunk_size))
         return hasher.hexdigest()
     except (OSError, IOError) as e:
         print(f"[ERROR] Tidak bisa membaca file {filepath}: {e}")
         return None
 
-def scan_directory(folder_path):
+def walk_files(folder_path):
+    """
+    Menelusuri folder (tanpa masuk ke symlink folder) dan menghasilkan
+    (path, stat) untuk setiap file. Ukuran dll. diambil dari stat saat walk.
+    """
+    stack = [folder_path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file():
+                            yield entry.path, entry.stat()
+                    except OSError as e:
+                        print(f"[ERROR] Tidak bisa membaca {entry.path}: {e}")
+        except OSError as e:
+            print(f"[ERROR] Tidak bisa membuka folder: {e}")
+
+def file_identity(filepath, st):
     """
-    Scan folder dan sub-folder untuk mencari duplikat.
+    (st_dev, st_ino) untuk mengenali hardlink ke file yang sama. Di Windows
+    stat dari scandir selalu berisi 0, jadi diambil ulang lewat os.stat.
+    Mengembalikan None jika filesystem tidak punya nomor inode (jangan dedupe).
+    """
+    if not st.st_ino:
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        if not st.st_ino:
+            return None
+    return (st.st_dev, st.st_ino)
+
+def group_by(paths, key_func):
+    """Kelompokkan paths berdasarkan key_func, buang grup yang isinya cuma 1 file."""
+    groups = {}
+    for path in paths:
+        key = key_func(path)
+        if key is None:
+            continue # file gagal dibaca
+        if key not in groups:
+            groups[key] = []
+        groups[key].append(path)
+    return [group for group in groups.values() if len(group) > 1]
+
+def hash_files(paths, kind, compute, metas, cache=None, workers=DEFAULT_WORKERS):
+    """
+    Hash banyak file sekaligus di thread pool (maksimal `workers` file dibaca
+    bersamaan; hashlib melepas GIL saat hashing). Cache hanya diakses dari
+    thread utama karena koneksi SQLite tidak boleh dipakai lintas thread.
+    Mengembalikan ({path: hash}, daftar path yang benar-benar dibaca).
+    """
+    results = {}
+    todo = []
+    for filepath in paths:
+        value = cache.get(filepath, metas[filepath], kind) if cache is not None else None
+        if value is None:
+            todo.append(filepath)
+        else:
+            results[filepath] = value
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for filepath, value in zip(todo, pool.map(compute, todo)):
+            results[filepath] = value
+            if value is not None and cache is not None:
+                cache.put(filepath, metas[filepath], kind, value)
+    return results, todo
+
+def scan_directory(folder_path, cache=None, algorithm=DEFAULT_ALGORITHM, workers=DEFAULT_WORKERS, metas=None):
+    """
+    Scan folder dan sub-folder untuk mencari duplikat secara bertahap:
+    1. Kelompokkan file berdasarkan ukuran (tanpa membaca isi file).
+    2. Untuk ukuran yang sama, hash beberapa KB awal & akhir file.
+    3. Hanya yang masih sama yang di-hash penuh; grup kecil (<= COMPARE_MAX
+       file) dibandingkan langsung dan berhenti di byte pertama yang beda.
+    Jika cache (HashCache) diberikan, hash file yang tidak berubah sejak
+    scan sebelumnya diambil dari cache tanpa membaca file.
+    Jika metas (dict) diberikan, diisi {path: (size, mtime_ns, inode)} hasil
+    walk, untuk dicek ulang sebelum file dihapus / diganti.
+    Mengembalikan {(ukuran, hash): [list_file_path]} untuk grup duplikat.
     """
     print(f"\n[SCAN] Sedang memindai: {folder_path} ...")
+    if cache is not None:
+        # Hash dari algoritma lain tidak bisa dibandingkan, anggap cache miss
+        cache.algorithm = algorithm
     
-    # Dictionary untuk menyimpan {hash: [list_file_path]}
-    hashes = {}
+    # Tahap 1: {ukuran: [list_file_path]} dari hasil walk saja
+    by_size = {}
+    if metas is None:
+        metas = {} # {path: (size, mtime_ns, inode)} untuk cache
+    seen_inodes = set() # (st_dev, st_ino): hardlink ke file yang sama cukup sekali
+    hardlinks = 0
     total_files = 0
-    
-    # Walk through directory
-    for root, dirs, files in os.walk(folder_path):
-        for filename in files:
-            filepath = os.path.join(root, filename)
-            
-            # Skip file sistem/hidden jika perlu, tapi fokus ke semua file
-            
-            file_hash = get_file_hash(filepath)
-            if file_hash:
-                if file_hash not in hashes:
-                    hashes[file_hash] = []
-                hashes[file_hash].append(filepath)
-                total_files += 1
-                
-                # Visual feedback sederhana (print dot)
-                if total_files % 10 == 0:
-                    print(".", end="", flush=True)
-
-    print("\n[OK] Scan selesai!")
+    total_bytes = 0
+    for filepath, st in walk_files(folder_path):
+        inode = file_identity(filepath, st)
+        if inode is not None:
+            if inode in seen_inodes:
+                # Isi yang sama di disk, tidak ada ruang yang bisa dihemat
+                hardlinks += 1
+                continue
+            seen_inodes.add(inode)
+        file_size = st.st_size
+        if file_size not in by_size:
+            by_size[file_size] = []
+        by_size[file_size].append(filepath)
+        metas[filepath] = (file_size, st.st_mtime_ns, st.st_ino)
+        total_files += 1
+        total_bytes += file_size
+
+        # Visual feedback sederhana (print dot)
+        if total_files % 1000 == 0:
+            print(".", end="", flush=True)
+
+    # Ukuran yang unik tidak mungkin punya duplikat
+    size_groups = [(size, paths) for size, paths in by_size.items() if len(paths) > 1]
+    candidates = sum(len(paths) for _, paths in size_groups)
+    print(f"\n[INFO] {total_files} file, {candidates} kandidat dengan ukuran yang sama.")
+    if hardlinks:
+        print(f"[INFO] {hardlinks} hardlink dilewati (inode yang sama sudah dihitung).")
+
+    hash_start = time.perf_counter()
+    hashes, bytes_read = hash_candidates(size_groups, metas, cache, algorithm, workers)
+    hash_duration = time.perf_counter() - hash_start
+
+    print(f"[OK] Scan selesai! Dibaca {bytes_read / (1024 * 1024):.2f} MB "
+          f"dari total {total_bytes / (1024 * 1024):.2f} MB.")
+    if bytes_read and hash_duration > 0:
+        print(f"[SPEED] {bytes_read / (1024 * 1024) / hash_duration:.1f} MB/s "
+              f"({algorithm}, {workers} thread).")
+    if cache is not None:
+        pruned = cache.prune(folder_path, metas)
+        print(f"[CACHE] {cache.hits} hash dari cache, {cache.misses} dihitung ulang, "
+              f"{pruned} entri usang dihapus.")
     return hashes
 
+def hash_candidates(size_groups, metas, cache=None, algorithm=DEFAULT_ALGORITHM, workers=DEFAULT_WORKERS):
+    """
+    Tahap 2 & 3 untuk grup [(ukuran, [paths])] dengan ukuran yang sama.
+    Mengembalikan ({(ukuran, hash): [paths]}, byte yang dibaca).
+    """
+    bytes_read = 0
+
+    # Tahap 2: partial hash (file kecil langsung ke full hash, partial = seluruh isi)
+    partial_paths = [path for size, paths in size_groups if size > 2 * PARTIAL_SIZE for path in paths]
+    partials, read = hash_files(
+        partial_paths, 'partial',
+        lambda path: get_partial_hash(path, metas[path][0], algorithm=algorithm),
+        metas, cache, workers)
+    bytes_read += 2 * PARTIAL_SIZE * len(read)
+
+    full_paths = []
+    compare_groups = []
+    for file_size, paths in size_groups:
+        if file_size <= 2 * PARTIAL_SIZE:
+            full_paths.extend(paths)
+            continue
+        for group in group_by(paths, partials.get):
+            if len(group) <= COMPARE_MAX:
+                compare_groups.append(group)
+            else:
+                full_paths.extend(group)
+
+    # Tahap 3: full hash hanya untuk yang lolos partial hash
+    fulls, read = hash_files(full_paths, 'full',
+                             lambda path: get_file_hash(path, algorithm=algorithm),
+                             metas, cache, workers)
+    bytes_read += sum(metas[path][0] for path in read)
+
+    # Tahap 3b: grup kecil dibandingkan lockstep, berhenti begitu ada yang beda
+    # (kecuali hasil perbandingan grup yang sama, atau full hash semua
+    # anggotanya, sudah ada di cache)
+    todo = []
+    for group in compare_groups:
+        results = cache.get_compared(group, metas) if cache is not None else None
+        if results is None:
+            cached = [cache.get(path, metas[path], 'full') for path in group] if cache is not None else [None]
+            if None in cached:
+                todo.append(group)
+                continue
+            results = dict(zip(group, cached))
+        for filepath, value in results.items():
+            if value:
+                fulls[filepath] = value
+                full_paths.append(filepath)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for group, (results, read) in zip(todo, pool.map(lambda group: compare_files(group, algorithm), todo)):
+            bytes_read += read
+            for filepath, value in results.items():
+                fulls[filepath] = value
+                full_paths.append(filepath)
+                if cache is not None:
+                    cache.put(filepath, metas[filepath], 'full', value)
+            if cache is not None:
+                cache.put_compared(group, metas, results)
+
+    hashes = {}
+    for filepath in full_paths:
+        file_hash = fulls.get(filepath)
+        if file_hash:
+            key = (metas[filepath][0], file_hash)
+            if key not in hashes:
+                hashes[key] = []
+            hashes[key].append(filepath)
+    return hashes, bytes_read
+
+def stream_duplicates(folder_path, out, cache=None, algorithm=DEFAULT_ALGORITHM, workers=DEFAULT_WORKERS):
+    """
+    Versi scan_directory dengan memori terbatas untuk tree yang sangat besar.
+    Hasil walk ditulis ke SQLite sementara (bukan dict di RAM), lalu bucket
+    ukuran yang sama dibaca per batch, di-hash, dan setiap grup duplikat
+    langsung ditulis ke `out` sebagai satu baris JSON.
+    Mengembalikan (jumlah grup, jumlah file duplikat, byte terbuang).
+    """
+    print(f"\n[SCAN] Sedang memindai (streaming): {folder_path} ...")
+    if cache is not None:
+        cache.algorithm = algorithm
+
+    with tempfile.TemporaryDirectory(prefix="dupfinder_") as tmp_dir:
+        db = sqlite3.connect(os.path.join(tmp_dir, "files.db"))
+        # (file_dev, file_ino) unik: hardlink ke inode yang sama otomatis diabaikan.
+        # Tanpa nomor inode keduanya NULL, dan NULL tidak pernah bentrok di UNIQUE,
+        # jadi setiap path tetap tercatat.
+        db.execute("""
+            CREATE TABLE files (
+                size INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                file_dev INTEGER,
+                file_ino INTEGER,
+                UNIQUE (file_dev, file_ino)
+            )""")
+        batch = []
+        total_files = 0
+        for filepath, st in walk_files(folder_path):
+            inode = file_identity(filepath, st) or (None, None)
+            batch.append((st.st_size, filepath, st.st_mtime_ns, st.st_ino) + inode)
+            total_files += 1
+            if len(batch) >= 10000:
+                db.executemany("INSERT OR IGNORE INTO files VALUES (?, ?, ?, ?, ?, ?)", batch)
+                batch = []
+                print(".", end="", flush=True)
+        db.executemany("INSERT OR IGNORE INTO files VALUES (?, ?, ?, ?, ?, ?)", batch)
+        db.execute("CREATE INDEX files_size ON files (size)")
+        print(f"\n[INFO] {total_files} file tercatat.")
+
+        groups = 0
+        duplicates = 0
+        total_waste_size = 0
+        bytes_read = 0
+
+        def flush(size_groups, metas):
+            nonlocal groups, duplicates, total_waste_size, bytes_read
+            hashes, read = hash_candidates(size_groups, metas, cache, algorithm, workers)
+            bytes_read += read
+            for (file_size, file_hash), file_list in hashes.items():
+                if len(file_list) < 2:
+                    continue
+                original, copies = pick_original(file_list)
+                out.write(json.dumps({"size": file_size, "hash": file_hash, "original": original,
+                                      "duplicates": copies, "waste": file_size * len(copies)}) + "\n")
+                out.flush()
+                groups += 1
+                duplicates += len(copies)
+                total_waste_size += file_size * len(copies)
+
+        # Hanya satu batch bucket (kandidat) yang ada di memori sekaligus
+        size_groups = []
+        metas = {}
+        sizes = db.execute("SELECT size FROM files GROUP BY size HAVING COUNT(*) > 1")
+        for (file_size,) in sizes:
+            rows = db.execute("SELECT path, mtime_ns, ino FROM files WHERE size = ?", (file_size,)).fetchall()
+            size_groups.append((file_size, [path for path, _, _ in rows]))
+            for path, mtime_ns, ino in rows:
+                metas[path] = (file_size, mtime_ns, ino)
+            if len(metas) >= STREAM_BATCH:
+                flush(size_groups, metas)
+                size_groups = []
+                metas = {}
+        flush(size_groups, metas)
+        db.close()
+
+    print(f"[OK] Scan selesai! {groups} grup, {duplicates} file duplikat, "
+          f"potensi hemat {total_waste_size / (1024 * 1024):.2f} MB, dibaca {bytes_read / (1024 * 1024):.2f} MB.")
+    return groups, duplicates, total_waste_size
+
+def pick_original(file_list):
+    """
+    Sort file agar yang "asli" (biasanya nama terpendek) ada di awal.
+    Contoh: "foto.jpg" (asli) vs "foto - Copy.jpg" (copy)
+    Kalau panjangnya sama, urut per path supaya hasilnya selalu sama.
+    """
+    file_list.sort(key=lambda path: (len(path), path))
+    return file_list[0], file_list[1:]
+
+def duplicate_pairs(hashes):
+    """[(asli, duplikat)] untuk semua grup duplikat."""
+    pairs = []
+    for file_list in hashes.values():
+        if len(file_list) > 1:
+            original, copies = pick_original(file_list)
+            pairs.extend((original, copy) for copy in copies)
+    return pairs
+
+# ========================================
+# FOLDER DUPLIKAT (MERKLE HASH)
+# ========================================
+
+def find_duplicate_trees(folder_path, hashes):
+    """
+    Hitung hash Merkle tiap folder dari bawah ke atas: hash folder = hash dari
+    (nama, hash) semua isinya. Dua folder dengan hash sama berarti isi dan
+    struktur di dalamnya identik. Hanya file yang punya duplikat (ada di
+    hashes) yang punya hash, jadi folder berisi file unik langsung gugur.
+    Mengembalikan [(ukuran folder, jumlah file, [folder, ...])], folder
+    terbesar dulu (folder induk selalu sebelum subfoldernya).
+    """
+    key_of = {path: key for key, paths in hashes.items() if len(paths) > 1 for path in paths}
+    dir_hash = {} # {folder: hash atau None jika ada isi yang unik}
+    dir_info = {} # {folder: (total byte, jumlah file)}
+    by_hash = {}
+    for root, dirs, files in os.walk(folder_path, topdown=False):
+        entries = []
+        total_size = 0
+        total_files = 0
+        unique = False
+        for name in files:
+            key = key_of.get(os.path.join(root, name))
+            if key is None:
+                unique = True
+                break
+            entries.append(('f', name, key[0], key[1]))
+            total_size += key[0]
+            total_files += 1
+        if not unique:
+            for name in dirs:
+                sub = os.path.join(root, name)
+                if dir_hash.get(sub) is None:
+                    unique = True # subfolder unik (atau symlink yang tidak ditelusuri)
+                    break
+                entries.append(('d', name, dir_hash[sub]))
+                total_size += dir_info[sub][0]
+                total_files += dir_info[sub][1]
+        if unique or total_size == 0:
+            # Folder kosong / isinya kosong semua tidak menghemat apa-apa
+            dir_hash[root] = None
+            continue
+
+        hasher = hashlib.blake2b(digest_size=20)
+        hasher.update(repr(sorted(entries)).encode('utf-8'))
+        value = hasher.hexdigest()
+        dir_hash[root] = value
+        dir_info[root] = (total_size, total_files)
+        if value not in by_hash:
+            by_hash[value] = []
+        by_hash[value].append(root)
+
+    groups = [dir_info[dirs[0]] + (dirs,) for dirs in by_hash.values() if len(dirs) > 1]
+    # Induk tidak pernah lebih kecil dan selalu lebih dangkal dari subfoldernya
+    groups.sort(key=lambda group: (-group[0], min(d.count(os.sep) for d in group[2])))
+    return groups
+
+def report_duplicate_trees(groups):
+    """
+    Tampilkan folder duplikat. Subfolder dari folder yang sudah dijadwalkan
+    dihapus tidak diulang (dan tidak pernah dipilih sebagai yang "asli").
+    Mengembalikan ([(folder asli, folder duplikat)], byte terbuang).
+    """
+    pairs = []
+    total_waste_size = 0
+    deleted = () # prefix folder yang sudah dijadwalkan dihapus
+    for size, count, dirs in groups:
+        dirs = [d for d in dirs if not os.path.join(d, '').startswith(deleted)]
+        if len(dirs) < 2:
+            continue
+        if not pairs:
+            print("\n" + "=" * 60)
+            print("LAPORAN FOLDER DUPLIKAT")
+            print("=" * 60)
+        original, copies = pick_original(dirs)
+        deleted += tuple(os.path.join(copy, '') for copy in copies)
+        total_waste_size += size * len(copies)
+        print(f"\n[FOLDER] {os.path.basename(original) or original} ({count} file, {size / (1024 * 1024):.2f} MB)")
+        print(f"   [KEEP] Asli (Dipertahankan): {original}")
+        for copy in copies:
+            print(f"   [DEL]  Duplikat (Akan dihapus): {copy}")
+            pairs.append((original, copy))
+    if pairs:
+        print(f"\n   Potensi Hemat Ruang (folder): {total_waste_size / (1024 * 1024):.2f} MB")
+    return pairs, total_waste_size
+
+def without_trees(hashes, tree_pairs):
+    """hashes tanpa file yang ada di dalam folder duplikat (sudah dilaporkan per folder)."""
+    prefixes = tuple(os.path.join(copy, '') for _, copy in tree_pairs)
+    if not prefixes:
+        return hashes
+    remaining = {}
+    for key, paths in hashes.items():
+        kept = [path for path in paths if not path.startswith(prefixes)]
+        if len(kept) > 1:
+            remaining[key] = kept
+    return remaining
+
+def tree_file_pairs(tree_pairs):
+    """Pasangan (file asli, file duplikat) untuk semua file di folder duplikat."""
+    pairs = []
+    for original, copy in tree_pairs:
+        for root, _, files in os.walk(copy):
+            rel = os.path.relpath(root, copy)
+            for name in files:
+                pairs.append((os.path.normpath(os.path.join(original, rel, name)), os.path.join(root, name)))
+    return pairs
+
+def reflink(src, dst):
+    """Buat dst sebagai salinan copy-on-write dari src (isi di disk dipakai bersama)."""
+    if fcntl is None:
+        raise OSError("reflink tidak didukung di sistem ini")
+    # 'xb': jangan pernah menimpa file yang sudah ada di dst
+    with open(src, 'rb') as fsrc, open(dst, 'xb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst) # dst baru saja dibuat di sini, aman dihapus
+            raise
+
+def _journal_write(journal, record):
+    journal.write(json.dumps(record) + "\n")
+    journal.flush()
+    os.fsync(journal.fileno())
+
+def recover_journal(journal_path=JOURNAL_PATH):
+    """
+    Bereskan operasi link yang terputus (crash / listrik mati).
+    File duplikat hanya diganti lewat os.replace yang atomic, jadi yang
+    mungkin tertinggal cuma file sementara; itu dihapus di sini, tapi
+    hanya jika journal mencatat file itu memang dibuat oleh run tersebut.
+    Mengembalikan jumlah operasi yang tidak selesai.
+    """
+    if not os.path.exists(journal_path):
+        return 0
+    pending = {}
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue # baris terakhir bisa terpotong saat crash
+            if record["op"] == "start":
+                pending[record["copy"]] = record
+            elif record["op"] == "linked":
+                if record["copy"] in pending:
+                    pending[record["copy"]]["linked"] = True
+            else:
+                pending.pop(record["copy"], None)
+    for record in pending.values():
+        if os.path.exists(record["tmp"]):
+            if record.get("linked"):
+                os.remove(record["tmp"])
+            else:
+                # Belum tercatat dibuat oleh program ini, jangan dihapus
+                print(f"[RECOVER] File sementara dibiarkan, periksa manual: {record['tmp']}")
+        print(f"[RECOVER] Tidak selesai, dibiarkan utuh: {record['copy']}")
+    os.remove(journal_path)
+    return len(pending)
+
+def changed_since_scan(st, meta):
+    """True jika stat file sekarang tidak cocok dengan (size, mtime_ns, inode) saat scan."""
+    if meta is None:
+        return True
+    size, mtime_ns, inode = meta
+    # inode 0: stat dari scandir di Windows tidak punya nomor inode
+    return st.st_size != size or st.st_mtime_ns != mtime_ns or bool(inode and st.st_ino != inode)
+
+def replace_with_links(pairs, mode='hardlink', journal_path=JOURNAL_PATH, metas=None):
+    """
+    Ganti setiap duplikat dengan hardlink (atau reflink) ke file aslinya.
+    Link dibuat dulu ke file sementara di folder yang sama, lalu di-rename
+    menimpa duplikat (atomic), dan setiap langkah dicatat di journal.
+    Jika metas hasil scan diberikan, pasangan yang salah satu filenya sudah
+    berubah sejak scan (mis. diedit dengan ukuran sama) dilewati.
+    Mengembalikan (jumlah file diganti, byte yang dihemat).
+    """
+    replaced = 0
+    saved = 0
+    with open(journal_path, 'a', encoding='utf-8') as journal:
+        for original, copy in pairs:
+            try:
+                src = os.stat(original)
+                dst = os.stat(copy)
+            except OSError as e:
+                print(f"[ERROR] {e}")
+                continue
+            if src.st_ino and (src.st_dev, src.st_ino) == (dst.st_dev, dst.st_ino):
+                continue # sudah satu inode
+            if src.st_size != dst.st_size:
+                print(f"[SKIP] Ukuran berubah sejak scan: {copy}")
+                continue
+            if metas is not None and (changed_since_scan(src, metas.get(original))
+                                      or changed_since_scan(dst, metas.get(copy))):
+                print(f"[SKIP] File berubah sejak scan: {copy}")
+                continue
+            if mode == 'hardlink' and src.st_dev != dst.st_dev:
+                print(f"[SKIP] Beda filesystem, tidak bisa hardlink: {copy}")
+                continue
+
+            tmp = copy + TMP_SUFFIX
+            _journal_write(journal, {"op": "start", "mode": mode, "original": original,
+                                     "copy": copy, "tmp": tmp})
+            created = False # tmp hanya boleh dihapus jika dibuat oleh run ini
+            try:
+                if mode == 'reflink':
+                    reflink(original, tmp)
+                else:
+                    os.link(original, tmp)
+                created = True
+                _journal_write(journal, {"op": "linked", "copy": copy})
+                os.replace(tmp, copy)
+            except OSError as e:
+                if created and os.path.exists(tmp):
+                    os.remove(tmp)
+                print(f"[ERROR] Gagal membuat {mode} untuk {copy}: {e}")
+            else:
+                print(f"[LINKED] {copy} -> {original}")
+                replaced += 1
+                saved += dst.st_size
+            _journal_write(journal, {"op": "done", "copy": copy})
+    os.remove(journal_path) # semua operasi selesai
+    return replaced, saved
+
 def process_duplicates(hashes):
     """
     Memproses hasil scan dan menampilkan laporan.
@@ -69,18 +816,12 @@ def process_duplicates(hashes):
     
     found_any = False
     
-    for file_hash, file_list in hashes.items():
+    for (file_size, file_hash), file_list in hashes.items():
         if len(file_list) > 1:
             found_any = True
             
-            # Sort file agar yang "asli" (biasanya nama terpendek) ada di awal
-            # Contoh: "foto.jpg" (asli) vs "foto - Copy.jpg" (copy)
-            file_list.sort(key=len)
+            original, copies = pick_original(file_list)
             
-            original = file_list[0]
-            copies = file_list[1:]
-            
-            file_size = os.path.getsize(original)
             waste_size = file_size * len(copies)
             total_waste_size += waste_size
             
@@ -103,12 +844,370 @@ def process_duplicates(hashes):
     
     return duplicates, total_waste_size
 
+# ========================================
+# NEAR-DUPLICATE GAMBAR (PERCEPTUAL HASH)
+# ========================================
+
+def image_hash(filepath, method='dhash', hash_size=HASH_SIZE):
+    """
+    Perceptual hash 64-bit dari gambar, tahan resize & re-encode:
+    - ahash: piksel 8x8 grayscale dibanding rata-ratanya
+    - dhash: gradien horizontal (piksel vs tetangga kanannya)
+    - phash: koefisien DCT frekuensi rendah dibanding mediannya
+    Mengembalikan (hash, (lebar, tinggi)) atau None jika gagal dibaca.
+    """
+    sizes = {'ahash': (hash_size, hash_size), 'dhash': (hash_size + 1, hash_size),
+             'phash': (hash_size * 4, hash_size * 4)}
+    try:
+        with Image.open(filepath) as img:
+            resolution = img.size
+            # JPEG bisa di-decode langsung dalam skala kecil, jauh lebih cepat
+            img.draft('L', sizes[method])
+            pixels = np.asarray(img.convert('L').resize(sizes[method], Image.LANCZOS), dtype=np.float64)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        # DecompressionBombError: gambar raksasa (> ~179 MP) ditolak Pillow
+        print(f"[ERROR] Tidak bisa membaca gambar {filepath}: {e}")
+        return None
+
+    if method == 'ahash':
+        bits = pixels > pixels.mean()
+    elif method == 'dhash':
+        bits = pixels[:, 1:] > pixels[:, :-1]
+    else:
+        dct = _dct_matrix(pixels.shape[0])
+        low = (dct @ pixels @ dct.T)[:hash_size, :hash_size]
+        bits = low > np.median(low)
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), 'big'), resolution
+
+def _dct_matrix(n):
+    """Matriks DCT-II ortonormal n x n (DCT 2D = M @ X @ M.T)."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.sqrt(2 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+class BKTree:
+    """
+    BK-tree untuk jarak Hamming. Query radius r hanya menelusuri cabang
+    dengan jarak di [d - r, d + r] (triangle inequality), jadi tidak perlu
+    membandingkan semua pasangan gambar.
+    """
+
+    def __init__(self):
+        self.root = None # node: [hash, {jarak: node anak}]
+
+    def add(self, value):
+        if self.root is None:
+            self.root = [value, {}]
+            return
+        node = self.root
+        while True:
+            dist = hamming(value, node[0])
+            if dist == 0:
+                return # hash yang sama sudah ada
+            child = node[1].get(dist)
+            if child is None:
+                node[1][dist] = [value, {}]
+                return
+            node = child
+
+    def query(self, value, radius):
+        """Semua hash dalam jarak <= radius dari value."""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            dist = hamming(value, node[0])
+            if dist <= radius:
+                found.append(node[0])
+            for child_dist, child in node[1].items():
+                if dist - radius <= child_dist <= dist + radius:
+                    stack.append(child)
+        return found
+
+def find_similar_images(folder_path, method='dhash', max_distance=DEFAULT_DISTANCE, workers=DEFAULT_WORKERS):
+    """
+    Cari gambar yang mirip (hasil resize/re-encode), bukan hanya yang identik.
+    Mengembalikan list grup [(path, (lebar, tinggi)), ...], resolusi terbesar dulu.
+    """
+    print(f"\n[SCAN] Mencari gambar mirip ({method}, jarak <= {max_distance}): {folder_path} ...")
+    seen_inodes = set()
+    paths = []
+    for filepath, st in walk_files(folder_path):
+        if not filepath.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        inode = file_identity(filepath, st)
+        if inode is not None:
+            if inode in seen_inodes:
+                continue
+            seen_inodes.add(inode)
+        paths.append(filepath)
+
+    # Decode gambar di thread pool (Pillow melepas GIL saat decode/resize)
+    by_hash = {} # {hash: [(path, resolusi)]}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for filepath, result in zip(paths, pool.map(lambda path: image_hash(path, method), paths)):
+            if result is not None:
+                value, resolution = result
+                if value not in by_hash:
+                    by_hash[value] = []
+                by_hash[value].append((filepath, resolution))
+    print(f"[INFO] {len(paths)} gambar, {len(by_hash)} hash berbeda.")
+
+    tree = BKTree()
+    for value in by_hash:
+        tree.add(value)
+
+    # Union-find: gambar A~B dan B~C masuk satu grup
+    parent = {value: value for value in by_hash}
+
+    def find(value):
+        while parent[value] != value:
+            parent[value] = parent[parent[value]]
+            value = parent[value]
+        return value
+
+    for value in by_hash:
+        for other in tree.query(value, max_distance):
+            parent[find(other)] = find(value)
+
+    clusters = {}
+    for value, images in by_hash.items():
+        root = find(value)
+        if root not in clusters:
+            clusters[root] = []
+        clusters[root].extend(images)
+
+    groups = [sorted(images, key=lambda image: (-image[1][0] * image[1][1], image[0]))
+              for images in clusters.values() if len(images) > 1]
+    groups.sort(key=len, reverse=True)
+    return groups
+
+def report_similar_images(groups):
+    print("\n" + "=" * 60)
+    print("LAPORAN GAMBAR MIRIP")
+    print("=" * 60)
+    if not groups:
+        print("\n[INFO] Tidak ditemukan gambar yang mirip.")
+        return
+    for images in groups:
+        (best, (width, height)), others = images[0], images[1:]
+        print(f"\n[FILE] {os.path.basename(best)} ({len(images)} gambar mirip)")
+        print(f"   [KEEP] Resolusi terbesar {width}x{height}: {best}")
+        for filepath, (width, height) in others:
+            print(f"   [MIRIP] {width}x{height}: {filepath}")
+    print("\n" + "-" * 60)
+    print(f"RINGKASAN: {len(groups)} grup, {sum(len(images) - 1 for images in groups)} gambar mirip.")
+    print("Gambar mirip tidak identik, jadi tidak dihapus otomatis. Periksa dulu secara manual.")
+    print("-" * 60)
+
+# ========================================
+# BLOK DUPLIKAT (CONTENT-DEFINED CHUNKING)
+# ========================================
+
+def iter_chunks(filepath, avg_size=CHUNK_AVG, block_size=READ_SIZE):
+    """
+    Potong file jadi blok berdasarkan isinya (FastCDC dengan rolling hash
+    Gear), jadi sisipan beberapa byte hanya mengubah blok di sekitarnya.
+    Batas blok dipilih saat bit atas hash Gear nol semua; mask lebih ketat
+    sebelum avg_size dan lebih longgar sesudahnya (normalized chunking).
+    File dibaca per blok read, memori tetap berapa pun ukuran file.
+    Menghasilkan (hash blok, ukuran) satu per satu; OSError diteruskan.
+    """
+    min_size = avg_size // 4
+    max_size = avg_size * 8
+    bits = avg_size.bit_length() - 1
+    mask_hard = ((1 << (bits + 2)) - 1) << (64 - bits - 2)
+    mask_easy = ((1 << (bits - 2)) - 1) << (64 - bits + 2)
+    gear = GEAR
+    hasher = hashlib.blake2b(digest_size=16)
+    length = 0 # byte blok saat ini dari buffer sebelumnya
+    h = 0
+    with open(filepath, 'rb') as f:
+        data = f.read(block_size)
+        while data:
+            start = 0 # awal blok saat ini di dalam data
+            i = start + max(0, min_size - length) # byte sebelum min_size tidak perlu di-hash
+            n = len(data)
+            while i < n:
+                size = length + i - start
+                # Cari batas sampai avg_size dengan mask ketat, lalu mask longgar
+                if size < avg_size:
+                    stop, mask = min(n, start + avg_size - length), mask_hard
+                else:
+                    stop, mask = min(n, start + max_size - length), mask_easy
+                found = False
+                for j in range(i, stop):
+                    h = ((h << 1) + gear[data[j]]) & 0xFFFFFFFFFFFFFFFF
+                    if not h & mask:
+                        found = True
+                        stop = j + 1
+                        break
+                cut = i = stop
+                if found or length + cut - start >= max_size:
+                    hasher.update(data[start:cut])
+                    yield hasher.digest(), length + cut - start
+                    hasher = hashlib.blake2b(digest_size=16)
+                    length = 0
+                    h = 0
+                    start = cut
+                    i = start + min_size
+            hasher.update(data[start:])
+            length += n - start
+            data = f.read(block_size)
+    if length:
+        yield hasher.digest(), length
+
+def chunk_file(filepath, out_path, avg_size=CHUNK_AVG):
+    """
+    Dijalankan di proses worker: tulis (hash, ukuran) tiap blok ke out_path
+    sebagai record biner, jadi daftar blok tidak pernah ada utuh di memori
+    dan tidak perlu di-pickle balik. Mengembalikan jumlah blok atau None.
+    """
+    count = 0
+    try:
+        with open(out_path, 'wb') as out:
+            for digest, size in iter_chunks(filepath, avg_size):
+                out.write(CHUNK_RECORD.pack(digest, size))
+                count += 1
+        return count
+    except (OSError, IOError) as e:
+        print(f"[ERROR] Tidak bisa membaca file {filepath}: {e}")
+        return None
+
+def read_chunk_records(path, batch=CHUNK_BATCH):
+    """Baca balik record dari chunk_file per batch (memori terbatas)."""
+    with open(path, 'rb') as f:
+        data = f.read(batch * CHUNK_RECORD.size)
+        while data:
+            yield from CHUNK_RECORD.iter_unpack(data)
+            data = f.read(batch * CHUNK_RECORD.size)
+
+def find_shared_chunks(folder_path, avg_size=CHUNK_AVG, workers=DEFAULT_WORKERS):
+    """
+    Chunk semua file (>= avg_size) dan bangun indeks {hash blok: ...} untuk
+    menghitung byte yang dipakai bersama antar file. Rolling hash dihitung
+    di Python murni (tidak melepas GIL), jadi file dibagi ke beberapa proses;
+    hasil tiap file dialirkan lewat file sementara, bukan list di memori.
+    Mengembalikan (total byte, byte unik, jumlah blok, [(byte bersama, file_a, file_b)]).
+    """
+    print(f"\n[SCAN] Memotong file jadi blok (rata-rata {avg_size} byte): {folder_path} ...")
+    seen_inodes = set()
+    paths = []
+    skipped = 0
+    for filepath, st in walk_files(folder_path):
+        inode = file_identity(filepath, st)
+        if inode is not None:
+            if inode in seen_inodes:
+                continue
+            seen_inodes.add(inode)
+        if st.st_size < avg_size:
+            skipped += 1 # file kecil cukup dicek lewat hash file utuh
+            continue
+        paths.append(filepath)
+    print(f"[INFO] {len(paths)} file di-chunk, {skipped} file kecil dilewati.")
+
+    index = {} # {hash blok: [ukuran, [id file yang memuatnya]]}
+    shared = {} # {(id_a, id_b): byte bersama}
+    total_bytes = 0
+    total_chunks = 0
+    chunked = []
+    with tempfile.TemporaryDirectory(prefix="dupfinder_") as tmp_dir, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        out_paths = [os.path.join(tmp_dir, f"{i}.chunks") for i in range(len(paths))]
+        results = pool.map(partial(chunk_file, avg_size=avg_size), paths, out_paths, chunksize=4)
+        for filepath, out_path, count in zip(paths, out_paths, results):
+            if count is None:
+                continue
+            file_id = len(chunked)
+            chunked.append(filepath)
+            total_chunks += count
+            for digest, size in read_chunk_records(out_path):
+                total_bytes += size
+                entry = index.get(digest)
+                if entry is None:
+                    index[digest] = [size, [file_id]]
+                    continue
+                owners = entry[1]
+                # owners[-1] == file_id: blok berulang di file yang sama, dihitung sekali
+                if len(owners) <= SHARE_LIMIT and owners[-1] != file_id:
+                    for other in owners:
+                        shared[(other, file_id)] = shared.get((other, file_id), 0) + size
+                    owners.append(file_id)
+            os.remove(out_path)
+
+    unique_bytes = sum(entry[0] for entry in index.values())
+    pairs = sorted(((size, chunked[a], chunked[b]) for (a, b), size in shared.items()), reverse=True)
+    return total_bytes, unique_bytes, total_chunks, pairs
+
+def report_shared_chunks(total_bytes, unique_bytes, total_chunks, pairs):
+    print("\n" + "=" * 60)
+    print("LAPORAN BLOK DUPLIKAT")
+    print("=" * 60)
+    if not total_bytes:
+        print("\n[INFO] Tidak ada file yang cukup besar untuk di-chunk.")
+        return
+    for size, file_a, file_b in pairs[:TOP_PAIRS]:
+        print(f"\n[BLOK] {size / (1024 * 1024):.2f} MB sama:")
+        print(f"   {file_a}")
+        print(f"   {file_b}")
+    if len(pairs) > TOP_PAIRS:
+        print(f"\n[INFO] ... dan {len(pairs) - TOP_PAIRS} pasangan lainnya.")
+    print("\n" + "-" * 60)
+    print(f"RINGKASAN: {total_chunks} blok, total {total_bytes / (1024 * 1024):.2f} MB, "
+          f"unik {unique_bytes / (1024 * 1024):.2f} MB.")
+    print(f"Rasio dedupe tingkat blok: {total_bytes / unique_bytes:.2f}x "
+          f"(hemat {(total_bytes - unique_bytes) / (1024 * 1024):.2f} MB dengan penyimpanan dedupe).")
+    print("Blok yang sama tidak berarti file-nya duplikat, jadi tidak ada yang dihapus.")
+    print("-" * 60)
+
 def main():
+    parser = argparse.ArgumentParser(description="Duplicate File Finder & Cleaner")
+    parser.add_argument("folder", nargs='?', help="Folder to scan (asked interactively if omitted)")
+    parser.add_argument("--algo", choices=available_algorithms(), default=DEFAULT_ALGORITHM,
+                        help=f"Hash algorithm (default: {DEFAULT_ALGORITHM}; xxhash if installed)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Files hashed concurrently (default: {DEFAULT_WORKERS}); "
+                             "higher for SSDs/parallel filesystems, 1-2 for spinning disks")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"Do not use the hash cache ({CACHE_PATH})")
+    parser.add_argument("--stream", metavar="FILE",
+                        help="Memory-bounded scan for huge trees: write duplicate groups as JSON lines "
+                             "to FILE ('-' for stdout) while scanning; report only")
+    parser.add_argument("--no-trees", action="store_true",
+                        help="Do not collapse identical folders; list every duplicate file")
+    parser.add_argument("--similar", action="store_true",
+                        help="Report near-duplicate images (resized/re-encoded) via perceptual hashes; "
+                             "needs Pillow and NumPy")
+    parser.add_argument("--method", choices=('ahash', 'dhash', 'phash'), default='dhash',
+                        help="Perceptual hash for --similar (default: dhash)")
+    parser.add_argument("--distance", type=int, default=DEFAULT_DISTANCE,
+                        help=f"Max differing bits (of 64) for --similar (default: {DEFAULT_DISTANCE})")
+    parser.add_argument("--chunks", action="store_true",
+                        help="Report block-level shared bytes between files using content-defined chunking "
+                             "(pure Python, roughly 5 MB/s per worker process)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_AVG,
+                        help=f"Average chunk size in bytes for --chunks, power of two (default: {CHUNK_AVG})")
+    args = parser.parse_args()
+    stream_out = None
+    if args.stream == '-':
+        # stdout khusus untuk JSON lines, semua pesan lain dialihkan ke stderr
+        stream_out = sys.stdout
+        sys.stdout = sys.stderr
+
     print("=" * 60)
     print("PYTHON DUPLICATE FILE FINDER & CLEANER")
     print("=" * 60)
     
-    folder_path = input("Masukkan Path Folder untuk discan: ").strip()
+    # Sisa operasi link yang terputus dari run sebelumnya
+    if recover_journal():
+        print("[RECOVER] Journal dari run sebelumnya sudah dibereskan.")
+
+    folder_path = args.folder or input("Masukkan Path Folder untuk discan: ").strip()
     
     # Hapus tanda kutip jika user melakukan copy path as pathh ("C:\...")
     folder_path = folder_path.replace('"', '')
@@ -117,25 +1216,70 @@ def main():
         print("\n[ERROR] Folder tidak ditemukan!")
         return
 
-    hashes = scan_directory(folder_path)
+    if args.similar:
+        if Image is None or np is None:
+            print("\n[ERROR] Mode --similar butuh Pillow dan NumPy (pip install pillow numpy).")
+            return
+        report_similar_images(find_similar_images(folder_path, args.method, args.distance,
+                                                  max(1, args.workers)))
+        return
+
+    if args.chunks:
+        if args.chunk_size < 256 or args.chunk_size & (args.chunk_size - 1):
+            print("\n[ERROR] --chunk-size harus pangkat dua dan minimal 256.")
+            return
+        report_shared_chunks(*find_shared_chunks(folder_path, args.chunk_size, max(1, args.workers)))
+        return
+
+    # Cache hash disimpan di home folder, dipakai ulang di scan berikutnya
+    cache = None if args.no_cache else HashCache()
+    try:
+        if args.stream:
+            stream_mode(args, folder_path, cache, stream_out)
+            return
+        metas = {}
+        hashes = scan_directory(folder_path, cache, args.algo, max(1, args.workers), metas)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    # Folder yang identik dilaporkan sekali, file di dalamnya tidak diulang
+    tree_pairs = []
+    tree_waste = 0
+    if not args.no_trees:
+        tree_pairs, tree_waste = report_duplicate_trees(find_duplicate_trees(folder_path, hashes))
+        hashes = without_trees(hashes, tree_pairs)
     files_to_delete, saved_space = process_duplicates(hashes)
+    saved_space += tree_waste
     
-    if not files_to_delete:
+    if not files_to_delete and not tree_pairs:
         return
 
     print("\n[PILIHAN TINDAKAN]")
     print("[1] Hapus Semua File Duplikat (Hanya simpan yang Asli)")
     print("[2] Biarkan Saja & Keluar")
+    print("[3] Ganti Duplikat dengan Hardlink (file tetap ada, isi disimpan sekali)")
+    print("[4] Ganti Duplikat dengan Reflink (copy-on-write, Linux btrfs/XFS)")
     
-    pilihan = input("\nPilihan Anda (1/2): ").strip()
+    pilihan = input("\nPilihan Anda (1/2/3/4): ").strip()
     
     if pilihan == '1':
-        confirm = input(f"[WARNING] Yakin ingin menghapus {len(files_to_delete)} file? (y/n): ").strip().lower()
+        confirm = input(f"[WARNING] Yakin ingin menghapus {len(tree_pairs)} folder dan "
+                        f"{len(files_to_delete)} file? (y/n): ").strip().lower()
         if confirm == 'y':
             print("\nMemulai penghapusan...")
             deleted_count = 0
+            for _, folder in tree_pairs:
+                try:
+                    shutil.rmtree(folder)
+                    print(f"[DELETED] Folder dihapus: {folder}")
+                except OSError as e:
+                    print(f"[ERROR] Gagal menghapus {folder}: {e}")
             for filepath in files_to_delete:
                 try:
+                    if changed_since_scan(os.stat(filepath), metas.get(filepath)):
+                        print(f"[SKIP] File berubah sejak scan, tidak dihapus: {filepath}")
+                        continue
                     os.remove(filepath)
                     print(f"[DELETED] Dihapus: {filepath}")
                     deleted_count += 1
@@ -144,14 +1288,33 @@ def main():
             
             print("\n" + "=" * 60)
             print(f"SUKSES! Bersih-bersih selesai.")
-            print(f"   {deleted_count} file dihapus.")
+            print(f"   {len(tree_pairs)} folder dan {deleted_count} file dihapus.")
             print(f"   Ruang penyimpanan hemat: {saved_space / (1024 * 1024):.2f} MB")
             print("=" * 60)
         else:
             print("\n[INFO] Penghapusan dibatalkan.")
+    elif pilihan in ('3', '4'):
+        mode = 'hardlink' if pilihan == '3' else 'reflink'
+        pairs = duplicate_pairs(hashes) + tree_file_pairs(tree_pairs)
+        confirm = input(f"[WARNING] Yakin ingin mengganti {len(pairs)} file dengan {mode}? (y/n): ").strip().lower()
+        if confirm == 'y':
+            replaced, saved = replace_with_links(pairs, mode, metas=metas)
+            print("\n" + "=" * 60)
+            print(f"SUKSES! {replaced} file diganti dengan {mode}.")
+            print(f"   Ruang penyimpanan hemat: {saved / (1024 * 1024):.2f} MB")
+            print("=" * 60)
+        else:
+            print("\n[INFO] Penggantian dibatalkan.")
     else:
         print("\n[INFO] Tidak ada file yang dihapus. Program selesai.")
 
+def stream_mode(args, folder_path, cache, stream_out=None):
+    if stream_out is not None:
+        stream_duplicates(folder_path, stream_out, cache, args.algo, max(1, args.workers))
+        return
+    with open(args.stream, 'w', encoding='utf-8') as out:
+        stream_duplicates(folder_path, out, cache, args.algo, max(1, args.workers))
+
 if __name__ == "__main__":
     # Library hashlib dan os adalah bawaan Python, tidak perlu install
     main()
@@ -1,132 +1,2351 @@
 import os
+import sys
 import re
 import time
+import mmap
+import struct
+import shutil
+import tempfile
+import itertools
+import heapq
+import math
+import bisect
+from array import array
+from collections import Counter, OrderedDict, deque
+import argparse
+import json
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
+from rich.text import Text
 from rich.prompt import Prompt
 
+try:
+    # Optional: native file change notifications (inotify on Linux)
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
 console = Console()
 
+EXTENSIONS = ('.txt', '.md', '.py', '.html', '.css', '.js')
+INDEX_FILENAME = ".search_index.bin"
+INDEX_VERSION = 10
+BATCH_SIZE = 64 # max files per worker task in parallel mode
+COMPACT_RATIO = 0.25 # rewrite postings once this share of doc ids is deleted
+TERM_OVERHEAD = 150 # approx. bytes per in-memory term (dict slots, str, bytearray, last_doc)
+DOC_OVERHEAD = 250 # approx. bytes per doc in the doc table (path str, dict slots, files tuple)
+MAX_EXPANSIONS = 64 # max index terms a wildcard/fuzzy query term expands to
+QUERY_CACHE_SIZE = 200000 # max (path, line) hits kept in the query result cache
+_cache_lock = threading.Lock() # query caches are shared by batch query threads
+PHASES = ('walk', 'read', 'tokenize', 'insert', 'merge', 'save')
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000) # query latency histogram bounds
+BM25_K1 = 1.2
+BM25_B = 0.75
+VARINT_END_BYTES = bytes(range(0x80)) # last byte of every varint
+
+def _append_varint(buf, value):
+    """Append a non-negative int to a bytearray as a LEB128 varint."""
+    while value > 0x7F:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+def _read_varint(buf, pos):
+    """Decode one varint at pos. Returns (value, next_pos)."""
+    value = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def _read_varint_stream(f):
+    """Decode one varint from a binary file. Returns None at end of file."""
+    value = 0
+    shift = 0
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        value |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+def write_segment(path, items):
+    """Write (term, postings) pairs, already sorted by term, to a segment file.
+
+    Record layout: varint(len(term)), term (utf-8), varint(len(postings)), postings.
+    """
+    with open(path, 'wb') as f:
+        for term, postings in items:
+            record = bytearray()
+            encoded = term.encode('utf-8')
+            _append_varint(record, len(encoded))
+            record += encoded
+            _append_varint(record, len(postings))
+            f.write(record)
+            f.write(postings)
+
+def read_segment(path):
+    """Stream (term, postings) pairs back from a segment file."""
+    with open(path, 'rb') as f:
+        while True:
+            size = _read_varint_stream(f)
+            if size is None:
+                return
+            term = f.read(size).decode('utf-8')
+            yield term, f.read(_read_varint_stream(f))
+
+# ---- Binary index file ----
+# Little-endian layout, everything addressed by absolute file offsets:
+#   header | meta JSON | doc paths (NUL separated) | line offset arrays |
+#   doc entries | postings + skip tables | term strings | term entries (sorted by term) |
+#   trigram doc id arrays | trigram entries (sorted by trigram)
+# Entries are fixed-size, so terms and trigrams are found by binary search
+# directly in the mapped file and only the postings a query touches are read.
+# Every term's postings are followed by its skip table: the doc id before and
+# the byte offset of every SKIP_INTERVAL-th block, as a doc id array followed
+# by an offset array, so a cursor can jump close to a target doc.
+
+INDEX_MAGIC = b'LSEIDX\x00\x01'
+INDEX_HEADER = struct.Struct('<8s5I11Q') # magic, version, flags, num_docs, num_terms,
+    # num_trigrams, total_length, meta_off, meta_len, paths_off, paths_len,
+    # docs_off, terms_off, term_blob_off, trigrams_off, num_postings, postings_bytes
+DOC_ENTRY = struct.Struct('<qqIIQ1s') # size, mtime_ns, length, line count, offsets pos, typecode
+TERM_ENTRY = struct.Struct('<QIQQIIQI') # string off, string len, postings off, postings len,
+    # last doc, doc count, skips off, skip count
+TRIGRAM_ENTRY = struct.Struct('<3sQI') # trigram, doc ids off, doc count
+FLAG_TRIGRAMS = 1
+FLAG_CODE_TERMS = 2
+SKIP_INTERVAL = 64 # postings blocks per skip table entry
+
+class MappedIndex:
+    """Read-only, mmap-backed view of a binary index file written by InvertedIndex.save()."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            header = INDEX_HEADER.unpack_from(self.mm, 0)
+        except (ValueError, struct.error, OSError):
+            self.file.close()
+            raise ValueError(f"{path} is not an index file")
+        if header[0] != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an index file")
+        (_, self.version, self.flags, self.num_docs, self.num_terms, self.num_trigrams,
+         self.total_length, meta_off, meta_len, self.paths_off, self.paths_len,
+         self.docs_off, self.terms_off, self.term_blob_off, self.trigrams_off,
+         self.num_postings, self.postings_bytes) = header
+        self.meta = json.loads(self.mm[meta_off:meta_off + meta_len])
+
+    def close(self):
+        if getattr(self, 'mm', None) is not None:
+            self.mm.close()
+            self.mm = None
+        self.file.close()
+
+    def doc_table(self):
+        """Return (paths with None for deleted docs, doc lengths, {path: (size, mtime_ns)})."""
+        paths = [path or None for path in
+                 self.mm[self.paths_off:self.paths_off + self.paths_len].decode('utf-8').split('\0')]
+        lengths = array('I')
+        files = {}
+        end = self.docs_off + self.num_docs * DOC_ENTRY.size
+        for path, (size, mtime_ns, length, _, _, _) in zip(
+                paths, DOC_ENTRY.iter_unpack(self.mm[self.docs_off:end])):
+            lengths.append(length)
+            if path is not None:
+                files[path] = (size, mtime_ns)
+        return paths, lengths, files
+
+    def line_offsets(self, doc_id):
+        _, _, _, count, pos, typecode = DOC_ENTRY.unpack_from(self.mm, self.docs_off + doc_id * DOC_ENTRY.size)
+        offsets = array(typecode.decode('ascii'))
+        offsets.frombytes(self.mm[pos:pos + count * offsets.itemsize])
+        return offsets
+
+    def _term_entry(self, i):
+        return TERM_ENTRY.unpack_from(self.mm, self.terms_off + i * TERM_ENTRY.size)
+
+    def _term_bytes(self, entry):
+        start = self.term_blob_off + entry[0]
+        return self.mm[start:start + entry[1]]
+
+    def _find(self, term):
+        """Binary search the term entries. Returns the entry or None."""
+        key = term.encode('utf-8')
+        lo, hi = 0, self.num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = self._term_entry(mid)
+            if self._term_bytes(entry) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.num_terms:
+            entry = self._term_entry(lo)
+            if self._term_bytes(entry) == key:
+                return entry
+        return None
+
+    def __contains__(self, term):
+        return self._find(term) is not None
+
+    def __len__(self):
+        return self.num_terms
+
+    def get(self, term):
+        """Postings bytes of a term (copied out of the map), or None."""
+        entry = self._find(term)
+        if entry is None:
+            return None
+        return self.mm[entry[2]:entry[2] + entry[3]]
+
+    def last_doc(self, term):
+        return self._find(term)[4]
+
+    def skip_table(self, term):
+        """Return (postings len, last doc, doc count, skip doc ids, skip offsets)
+        of a term, or None. See postings_skips()."""
+        entry = self._find(term)
+        if entry is None:
+            return None
+        return (entry[3], entry[4], entry[5]) + self._skips(entry)
+
+    def _skips(self, entry):
+        pos, count = entry[6], entry[7]
+        skip_docs = array('I')
+        skip_docs.frombytes(self.mm[pos:pos + count * skip_docs.itemsize])
+        pos += count * skip_docs.itemsize
+        skip_offsets = array('Q')
+        skip_offsets.frombytes(self.mm[pos:pos + count * skip_offsets.itemsize])
+        return skip_docs, skip_offsets
+
+    def postings_size(self, term):
+        """Byte length of a term's postings (0 if absent), without reading them."""
+        entry = self._find(term)
+        return entry[3] if entry is not None else 0
+
+    def terms(self):
+        """Yield all terms in sorted order."""
+        for i in range(self.num_terms):
+            yield self._term_bytes(self._term_entry(i)).decode('utf-8')
+
+    def items(self):
+        """Yield (term, postings, last doc, skip table) for all terms in sorted order."""
+        for i in range(self.num_terms):
+            entry = self._term_entry(i)
+            yield (self._term_bytes(entry).decode('utf-8'), self.mm[entry[2]:entry[2] + entry[3]],
+                   entry[4], (entry[3], entry[4], entry[5]) + self._skips(entry))
+
+    def _trigram_entry(self, i):
+        return TRIGRAM_ENTRY.unpack_from(self.mm, self.trigrams_off + i * TRIGRAM_ENTRY.size)
+
+    def trigram_docs(self, gram):
+        lo, hi = 0, self.num_trigrams
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._trigram_entry(mid)[0] < gram:
+                lo = mid + 1
+            else:
+                hi = mid
+        doc_ids = array('I')
+        if lo < self.num_trigrams:
+            found, pos, count = self._trigram_entry(lo)
+            if found == gram:
+                doc_ids.frombytes(self.mm[pos:pos + count * doc_ids.itemsize])
+        return doc_ids
+
+    def trigrams(self):
+        """Yield all trigrams in sorted order."""
+        for i in range(self.num_trigrams):
+            yield self._trigram_entry(i)[0]
+
+class MappedTerms:
+    """The sorted term table of a MappedIndex as a read-only sequence.
+
+    Terms are decoded on access, so it can be bisected without reading the
+    whole vocabulary.
+    """
+
+    def __init__(self, mapped):
+        self.mapped = mapped
+
+    def __len__(self):
+        return self.mapped.num_terms
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.mapped.num_terms:
+            raise IndexError(i)
+        return self.mapped._term_bytes(self.mapped._term_entry(i)).decode('utf-8')
+
+    def __iter__(self):
+        return self.mapped.terms()
+
+def iter_blocks(buf):
+    """Decode the per-document blocks of a postings buffer.
+
+    Layout: one block per document, in increasing doc id order:
+        varint(doc_id gap), varint(term frequency), varint(byte length of the lines),
+        varint(line gap) * n
+    Gaps are relative to the previous doc id / line (both start at 0). The
+    byte length lets a cursor skip a whole document without decoding it.
+    Yields (doc_id, tf, lines_start, lines_end).
+    """
+    pos = 0
+    end = len(buf)
+    doc_id = 0
+    while pos < end:
+        gap, pos = _read_varint(buf, pos)
+        doc_id += gap
+        tf, pos = _read_varint(buf, pos)
+        size, pos = _read_varint(buf, pos)
+        yield doc_id, tf, pos, pos + size
+        pos += size
+
+def postings_skips(buf, known=None):
+    """Return (doc count, skip doc ids, skip offsets) of a postings buffer.
+
+    known is the skip_table() of a prefix of buf (postings are only ever
+    appended to), in which case only the blocks after it are decoded.
+    """
+    if known is None:
+        pos, doc_id, count = 0, 0, 0
+        skip_docs, skip_offsets = array('I'), array('Q')
+    else:
+        pos, doc_id, count, skip_docs, skip_offsets = known
+        skip_docs, skip_offsets = array('I', skip_docs), array('Q', skip_offsets)
+    end = len(buf)
+    while pos < end:
+        if count and count % SKIP_INTERVAL == 0:
+            skip_docs.append(doc_id)
+            skip_offsets.append(pos)
+        gap, pos = _read_varint(buf, pos)
+        doc_id += gap
+        _, pos = _read_varint(buf, pos)
+        size, pos = _read_varint(buf, pos)
+        pos += size
+        count += 1
+    return count, skip_docs, skip_offsets
+
+def iter_postings(buf):
+    """Decode a postings buffer into (doc_id, line_num) pairs."""
+    for doc_id, _, pos, block_end in iter_blocks(buf):
+        line_num = 0
+        while pos < block_end:
+            gap, pos = _read_varint(buf, pos)
+            line_num += gap
+            yield doc_id, line_num
+
+# ---- Query matchers ----
+# A matcher walks matching (doc_id, line_num) pairs in increasing order, packed
+# into one int key (doc_id << 32 | line_num). `key` is the current match
+# (None when exhausted) and seek(target) moves to the first match >= target.
+
+LINE_BITS = 32
+
+class PostingsCursor:
+    """Lazy cursor over one postings buffer, skipping deleted docs.
+
+    With a skip table (see postings_skips()) a seek binary searches it and
+    starts decoding at most SKIP_INTERVAL blocks before the target doc.
+    """
+
+    def __init__(self, buf, doc_paths, skips=None):
+        self.buf = buf
+        self.doc_paths = doc_paths
+        self.skip_docs, self.skip_offsets = skips or ((), ())
+        self.skip = 0 # skip entries before this one are behind the cursor
+        self.pos = 0
+        self.doc_id = 0
+        self.block_end = 0
+        self.line_num = 0
+        self.tf = 0
+        self.key = None
+        self._next_block(0)
+
+    def _next_block(self, min_doc):
+        """Move to the first block of a live doc >= min_doc, skipping others unread."""
+        buf = self.buf
+        pos = self.block_end
+        doc_id = self.doc_id
+        skip_docs = self.skip_docs
+        if self.skip < len(skip_docs) and skip_docs[self.skip] < min_doc:
+            # Jump to the last skip point whose preceding blocks are all before min_doc
+            i = bisect.bisect_left(skip_docs, min_doc, self.skip) - 1
+            self.skip = i + 1
+            if self.skip_offsets[i] > pos:
+                pos = self.skip_offsets[i]
+                doc_id = skip_docs[i]
+        while pos < len(buf):
+            gap, pos = _read_varint(buf, pos)
+            doc_id += gap
+            tf, pos = _read_varint(buf, pos)
+            size, pos = _read_varint(buf, pos)
+            if doc_id >= min_doc and self.doc_paths[doc_id] is not None:
+                self.doc_id = doc_id
+                self.tf = tf
+                self.block_end = pos + size
+                self.pos = pos
+                self.line_num = 0
+                self._next_line()
+                return
+            pos += size
+        self.doc_id = doc_id
+        self.block_end = pos
+        self.key = None
+
+    def _next_line(self):
+        gap, self.pos = _read_varint(self.buf, self.pos)
+        self.line_num += gap
+        self.key = (self.doc_id << LINE_BITS) | self.line_num
+
+    def advance(self):
+        if self.pos < self.block_end:
+            self._next_line()
+        else:
+            self._next_block(self.doc_id + 1)
+
+    def seek(self, target):
+        target_doc = target >> LINE_BITS
+        if self.key is not None and self.doc_id < target_doc:
+            self._next_block(target_doc)
+        while self.key is not None and self.key < target:
+            self.advance()
+
+class EmptyMatcher:
+    key = None
+
+    def advance(self):
+        pass
+
+    def seek(self, target):
+        pass
+
+class AndMatcher:
+    """Leapfrog intersection: every cursor seeks to the largest current key,
+    so rare terms drive the walk and common ones skip whole documents."""
+
+    def __init__(self, children, excluded=()):
+        self.children = children
+        self.excluded = excluded
+        self.key = None
+        self._align()
+
+    def _align(self):
+        children = self.children
+        while True:
+            target = 0
+            for child in children:
+                if child.key is None:
+                    self.key = None
+                    return
+                target = max(target, child.key)
+            for child in children:
+                child.seek(target)
+            keys = [child.key for child in children]
+            if None in keys:
+                self.key = None
+                return
+            if max(keys) != target:
+                continue # someone overshot, leap again
+            if self._is_excluded(target):
+                children[0].advance()
+                continue
+            self.key = target
+            return
+
+    def _is_excluded(self, key):
+        for matcher in self.excluded:
+            matcher.seek(key)
+            if matcher.key == key:
+                return True
+        return False
+
+    def advance(self):
+        self.children[0].advance()
+        self._align()
+
+    def seek(self, target):
+        if self.key is not None and self.key < target:
+            self.children[0].seek(target)
+            self._align()
+
+class OrMatcher:
+    """Union of sorted matchers (deduplicated)."""
+
+    def __init__(self, children):
+        self.children = children
+        self._update()
+
+    def _update(self):
+        keys = [child.key for child in self.children if child.key is not None]
+        self.key = min(keys) if keys else None
+
+    def advance(self):
+        current = self.key
+        for child in self.children:
+            if child.key == current:
+                child.advance()
+        self._update()
+
+    def seek(self, target):
+        for child in self.children:
+            child.seek(target)
+        self._update()
+
+class FilterMatcher:
+    """Pass through only keys accepted by a predicate (used to verify phrases)."""
+
+    def __init__(self, inner, accept):
+        self.inner = inner
+        self.accept = accept
+        self._skip()
+
+    def _skip(self):
+        while self.inner.key is not None and not self.accept(self.inner.key):
+            self.inner.advance()
+        self.key = self.inner.key
+
+    def advance(self):
+        self.inner.advance()
+        self._skip()
+
+    def seek(self, target):
+        self.inner.seek(target)
+        self._skip()
+
+class RegexMatcher:
+    """Regex matches per line, only in candidate docs (chosen by the trigram index).
+
+    Each candidate file is read and searched as one buffer; a match offset is
+    mapped to its line through the doc's line offset table.
+    """
+
+    def __init__(self, index, pattern, doc_ids):
+        self.index = index
+        self.pattern = pattern
+        self.doc_ids = doc_ids
+        self.pos = 0 # next candidate doc to read
+        self.keys = [] # matches of the last doc read
+        self.key_pos = 0
+        self.key = None
+        self._load(0)
+
+    def _load(self, min_key):
+        """Advance to the first match >= min_key, reading docs only as needed."""
+        while True:
+            if self.keys and self.keys[-1] >= min_key:
+                self.key_pos = bisect.bisect_left(self.keys, min_key, self.key_pos)
+                self.key = self.keys[self.key_pos]
+                return
+            min_doc = min_key >> LINE_BITS
+            while self.pos < len(self.doc_ids) and self.doc_ids[self.pos] < min_doc:
+                self.pos += 1
+            if self.pos >= len(self.doc_ids):
+                self.key = None
+                return
+            self.keys = self._match_doc(self.doc_ids[self.pos])
+            self.key_pos = 0
+            self.pos += 1
+
+    def _match_doc(self, doc_id):
+        try:
+            with open(self.index.doc_paths[doc_id], 'rb') as f:
+                data = f.read()
+        except OSError:
+            return []
+        offsets = self.index.line_offsets(doc_id)
+        keys = []
+        match = self.pattern.search(data)
+        while match:
+            line_idx = bisect.bisect_right(offsets, match.start()) - 1
+            keys.append((doc_id << LINE_BITS) | (line_idx + 1))
+            if line_idx + 1 >= len(offsets):
+                break
+            # One hit per line is enough: continue at the next line
+            match = self.pattern.search(data, offsets[line_idx + 1])
+        return keys
+
+    def advance(self):
+        self._load(self.key + 1)
+
+    def seek(self, target):
+        if self.key is not None and self.key < target:
+            self._load(target)
+
+class LineReader:
+    """Read single lines of indexed files on demand via their line offset tables.
+
+    Keeps the most recently used file open, so reading many lines of the same
+    file (results arrive grouped by document) costs one open.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.path = None
+        self.file = None
+
+    def read(self, path, line_num):
+        if path != self.path:
+            self.close()
+            try:
+                self.file = open(path, 'rb')
+            except OSError:
+                return ""
+            self.path = path
+        offsets = self.index.line_offsets(self.index.doc_ids[path])
+        if not 0 < line_num <= len(offsets):
+            return ""
+        self.file.seek(offsets[line_num - 1])
+        return self.file.readline().decode('utf-8', errors='ignore')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        self.path = None
+        self.file = None
+
+TOKEN_RE = re.compile(r'\w+|\n') # words, plus newlines to count lines in one pass
+NEWLINE_RE = re.compile(rb'\n')
+CODE_PART_RE = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+') # HTTPServer -> HTTP, Server
+# A leading '-' stays attached to phrases, regexes and groups: -"a b", -(x OR y)
+QUERY_TOKEN_RE = re.compile(r'-?/(?:\\.|[^/\\])+/i?|-?"[^"]*"?|-?\(|\)|[^\s()"]+')
+REGEX_TOKEN_RE = re.compile(r'/((?:\\.|[^/\\])+)/(i?)')
+WILDCARD_RE = re.compile(r'[\w*?]*[*?][\w*?]*')
+FUZZY_RE = re.compile(r'(\w+)~(\d)?')
+QUANTIFIER_RE = re.compile(r'\{\d*(?:,\d*)?\}')
+VERBOSE_FLAG_RE = re.compile(r'\(\?[aiLmsux-]*x') # (?x) / (?x:...): whitespace is not literal
+ESCAPE_ARG_RE = re.compile(r'x[0-9a-fA-F]{0,2}|u[0-9a-fA-F]{0,4}|U[0-9a-fA-F]{0,8}|N\{[^}]*\}?|\d{1,3}')
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (a swap counts as one edit).
+
+    Returns limit + 1 as soon as the distance is known to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        prev2, prev = prev, row
+    return prev[-1]
+
+def regex_literals(pattern):
+    """Literal strings every match of a regex must contain (conservative).
+
+    Only top-level literal runs are used: anything inside groups or classes,
+    and any char made optional by `?`/`*`/`{m,n}`, ends a run. Escapes and
+    their arguments (`\x41`, `\u00e9`, `\1`) are skipped entirely. A
+    top-level `|` means nothing is required, so an empty list is returned,
+    as it is for verbose patterns, whose spaces and comments are not text.
+    """
+    if VERBOSE_FLAG_RE.search(pattern):
+        return []
+    runs = []
+    run = ''
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\' and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            if depth == 0 and not escaped.isalnum():
+                run += escaped
+                i += 2
+                continue
+            runs.append(run)
+            run = ''
+            arg = ESCAPE_ARG_RE.match(pattern, i + 1)
+            i = arg.end() if arg else i + 2
+            continue
+        if c == '[':
+            # Skip the whole character class
+            runs.append(run)
+            run = ''
+            i += 1
+            if pattern[i:i + 1] == '^':
+                i += 1
+            if pattern[i:i + 1] == ']':
+                i += 1 # `[]...]` / `[^]...]`: a leading ] is part of the class
+            while i < len(pattern) and pattern[i] != ']':
+                i += 2 if pattern[i] == '\\' else 1
+        elif c in '*?{':
+            runs.append(run[:-1]) # previous char may be absent
+            run = ''
+            if c == '{':
+                quantifier = QUANTIFIER_RE.match(pattern, i)
+                if quantifier:
+                    i = quantifier.end() # counts are not literal text
+                    continue
+        elif c == '|' and depth == 0:
+            return []
+        elif c in '()':
+            depth += 1 if c == '(' else -1
+            runs.append(run)
+            run = ''
+        elif c in '.^$+':
+            runs.append(run)
+            run = ''
+        elif depth == 0:
+            run += c
+        i += 1
+    runs.append(run)
+    return [r for r in runs if r]
+
+def auto_fuzziness(word):
+    """Allowed typos for a word: none for very short words, 1 up to 5 chars, else 2."""
+    if len(word) < 3:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+class TermDictionary:
+    """Sorted, binary-searchable view of the index vocabulary.
+
+    terms is any sorted sequence, such as a MappedTerms table, which is
+    bisected in place. Prefix lookups bisect it. Fuzzy and leading-wildcard
+    lookups use a character bigram index (built on first use) to shortlist
+    candidate terms instead of scanning the whole vocabulary. Words added
+    later go to a small overlay dictionary, so a new word does not re-sort
+    the vocabulary or rebuild its bigram index.
+    """
+
+    def __init__(self, terms):
+        self.terms = terms
+        self._bigrams = None # {bigram: [term_id, ...]}
+        self._added = [] # words added since, unsorted
+        self._overlay = None # TermDictionary of _added, built lazily
+
+    def add(self, term):
+        """Add a word that is new to the vocabulary."""
+        self._added.append(term)
+        self._overlay = None
+
+    def _merged(self, lookup):
+        """Merge the sorted results of lookup on this dictionary and its overlay."""
+        if self._added and self._overlay is None:
+            self._overlay = TermDictionary(sorted(self._added))
+        if self._overlay is None:
+            return lookup(self)
+        return heapq.merge(lookup(self), lookup(self._overlay))
+
+    def prefix(self, prefix):
+        """Yield terms starting with prefix, in sorted order."""
+        return self._merged(lambda terms: terms._prefix(prefix))
+
+    def _prefix(self, prefix):
+        terms = self.terms
+        i = bisect.bisect_left(terms, prefix)
+        while i < len(terms) and terms[i].startswith(prefix):
+            yield terms[i]
+            i += 1
+
+    def _bigram_index(self):
+        if self._bigrams is None:
+            bigrams = {}
+            for term_id, term in enumerate(self.terms):
+                padded = f"${term}$"
+                for gram in {padded[i:i + 2] for i in range(len(padded) - 1)}:
+                    if gram not in bigrams:
+                        bigrams[gram] = array('I')
+                    bigrams[gram].append(term_id)
+            self._bigrams = bigrams
+        return self._bigrams
+
+    def wildcard(self, pattern):
+        """Yield terms matching a pattern with `*` (any run) and `?` (one char), in sorted order."""
+        regex = re.compile(''.join('.*' if c == '*' else '.' if c == '?' else re.escape(c)
+                                   for c in pattern))
+        return self._merged(lambda terms: terms._wildcard(pattern, regex))
+
+    def _wildcard(self, pattern, regex):
+        literal_prefix = re.split(r'[*?]', pattern, 1)[0]
+        if literal_prefix:
+            candidates = self._prefix(literal_prefix)
+        else:
+            # Leading wildcard: every literal bigram must occur in the term
+            grams = {run[i:i + 2] for run in re.split(r'[*?]+', pattern) for i in range(len(run) - 1)}
+            if grams:
+                bigrams = self._bigram_index()
+                ids = None
+                for gram in sorted(grams, key=lambda g: len(bigrams.get(g, ()))):
+                    posting = set(bigrams.get(gram, ()))
+                    ids = posting if ids is None else ids & posting
+                    if not ids:
+                        break
+                candidates = (self.terms[term_id] for term_id in sorted(ids))
+            else:
+                candidates = iter(self.terms)
+        for term in candidates:
+            if regex.fullmatch(term):
+                yield term
+
+    def fuzzy(self, word, max_dist):
+        """Return terms within max_dist edits of word, closest first."""
+        return [term for _, term in self._merged(lambda terms: terms._fuzzy(word, max_dist))]
+
+    def _fuzzy(self, word, max_dist):
+        """Sorted (distance, term) pairs within max_dist edits of word."""
+        padded = f"${word}$"
+        grams = {padded[i:i + 2] for i in range(len(padded) - 1)}
+        # One edit (or swap) destroys at most 3 bigrams
+        min_shared = len(grams) - 3 * max_dist
+        if min_shared > 0:
+            bigrams = self._bigram_index()
+            shared = Counter()
+            for gram in grams:
+                shared.update(bigrams.get(gram, ()))
+            candidates = [self.terms[term_id] for term_id, n in shared.items() if n >= min_shared]
+        else:
+            # Too short for the bigram filter to prune anything safely
+            candidates = [term for term in self.terms if abs(len(term) - len(word)) <= max_dist]
+
+        matches = []
+        for term in candidates:
+            dist = edit_distance(word, term, max_dist)
+            if dist <= max_dist:
+                matches.append((dist, term))
+        matches.sort()
+        return matches
+
 class InvertedIndex:
-    def __init__(self):
-        self.index = {}  # {word: [(path, line_num), ...]}
-        self.documents = {} # {path: [lines]}
+    def __init__(self, trigrams=False):
+        # Postings live in the mapped index file (base) plus, for words written
+        # since it was saved, in memory. An in-memory entry shadows the base
+        # and already contains its postings (copied on first append).
+        self.base = None # MappedIndex
+        self.index = {}  # {word: bytearray of delta/varint encoded postings}
+        self.last_doc = {} # {word: last doc_id in its postings} -> for appending gaps
+        self.doc_paths = [] # doc table: doc_id -> path (None = deleted)
+        self.doc_ids = {} # {path: doc_id}
+        self.doc_lengths = array('I') # doc_id -> number of tokens (for BM25)
+        self.total_length = 0 # sum of doc_lengths over live docs
+        self.num_postings = 0 # (doc, line) pairs in all postings, tombstoned docs included
+        self.doc_offsets = [] # doc_id -> array of byte offsets where each line starts (None: in base)
+        self.files = {} # {path: (size, mtime_ns)}
+        # {lowercased 3-byte slice: array of doc_ids} for regex/substring search,
+        # only doc ids added since the base was saved
+        self.trigrams = {} if trigrams else None
+        self.fuzzy = False # typo-tolerant mode: unknown words match close terms
+        self.code_terms = False # also index camelCase/snake_case parts of identifiers
+        # SPIMI: when set, postings beyond this many bytes are spilled to
+        # sorted segment files during indexing and k-way merged at the end,
+        # straight into the index file at index_path when there is one
+        self.memory_budget = None
+        self.index_path = None
+        self.root_dir = None
+        self._pending_bytes = 0 # estimated size of in-memory postings
+        self._segment_dir = None
+        self._segments = []
+        self._term_dict = None # TermDictionary, rebuilt lazily when vocabulary changes
+        # Bumped whenever search results may change; the query cache is only
+        # valid for the generation it was filled in
+        self.generation = 0
+        self.saved_generation = None # generation last written to / loaded from the index file
+        self._cache = OrderedDict() # {parsed query: results}, least recently used first
+        self._cache_size = 0 # hits stored in _cache
+        self._cache_generation = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Instrumentation for stats(): seconds per indexing phase (summed over
+        # workers in parallel mode), bytes of file content read and a
+        # histogram of search latencies {bucket upper bound ms: count}
+        self.phase_times = Counter()
+        self.bytes_read = 0
+        self.query_latencies = Counter()
 
     def clean_text(self, text):
         """Tokenize and clean text."""
         # Simple regex to keep alphanumeric
         return re.findall(r'\b\w+\b', text.lower())
 
-    def build_index(self, root_dir):
-        """Walk directory and index files."""
+    def tokenize(self, text):
+        """Lowercased words of a whole file, with '\\n' tokens marking line breaks.
+
+        With code_terms, identifiers are also split into their parts:
+        parseQuery -> parsequery, parse, query; get_file_hash -> get_file_hash,
+        get, file, hash.
+        """
+        if not self.code_terms:
+            return TOKEN_RE.findall(text.lower())
+        tokens = []
+        for token in TOKEN_RE.findall(text):
+            lower = token.lower()
+            tokens.append(lower)
+            if '_' in token or not token.islower():
+                for part in CODE_PART_RE.findall(token):
+                    part = part.lower()
+                    if part != lower and len(part) > 1:
+                        tokens.append(part)
+        return tokens
+
+    @contextmanager
+    def _timed(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_times[phase] += time.perf_counter() - start
+
+    def scan_files(self, root_dir):
+        """Stat pass: return {path: (size, mtime_ns)} for every indexable file."""
+        with self._timed('walk'):
+            return self._scan_files(root_dir)
+
+    def _scan_files(self, root_dir):
+        found = {}
+        stack = [root_dir]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.endswith(EXTENSIONS):
+                            try:
+                                st = entry.stat()
+                            except OSError:
+                                continue
+                            found[entry.path] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                # Skip unreadable directories
+                continue
+        return found
+
+    def build_index(self, root_dir, index_path=None, jobs=1):
+        """Walk directory and index files.
+
+        If index_path is given, a previously saved index is loaded first and
+        only new/modified files are re-indexed; deleted files are dropped.
+        With jobs > 1 files are indexed in batches on a process pool.
+        Paths are stored absolute, so a saved index works from any directory.
+        """
+        root_dir = os.path.abspath(root_dir)
         console.print(f"[bold cyan]Scanning {root_dir}...[/bold cyan]")
         start_time = time.time()
-        count = 0
-        
-        for dirpath, _, filenames in os.walk(root_dir):
-            for filename in filenames:
-                if filename.endswith(('.txt', '.md', '.py', '.html', '.css', '.js')):
-                    filepath = os.path.join(dirpath, filename)
-                    self._index_file(filepath)
-                    count += 1
-                    
+
+        if index_path and os.path.exists(index_path):
+            self.load(index_path, root_dir)
+
+        self.index_path = index_path
+        self.root_dir = root_dir
+        changed, removed, index_duration = self.refresh(self.scan_files(root_dir), jobs)
+
+        # A SPIMI merge may already have streamed everything into index_path
+        if (index_path and (removed or changed or not os.path.exists(index_path))
+                and self.saved_generation != self.generation):
+            self.save(index_path, root_dir)
+
         duration = time.time() - start_time
-        console.print(f"[green]Indexed {count} files in {duration:.2f} seconds.[/green]")
+        console.print(f"[green]Indexed {len(self.files)} files in {duration:.2f} seconds "
+                      f"({len(changed)} re-indexed, {len(removed)} removed).[/green]")
+        if changed and index_duration > 0:
+            console.print(f"[dim]Indexing speed: {len(changed) / index_duration:.0f} files/sec "
+                          f"with {jobs} job(s).[/dim]")
+
+    def stat_paths(self, paths):
+        """Return {path: (size, mtime_ns) or None if gone} for specific paths."""
+        found = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+                found[path] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                found[path] = None
+        return found
+
+    def refresh(self, current, jobs=1, partial=False):
+        """Re-index new/modified files and drop deleted ones.
+
+        current is {path: (size, mtime_ns)} for the whole tree, or with
+        partial=True only for some paths (None meaning the file is gone).
+        Returns (changed paths, removed paths, indexing seconds).
+        """
+        if partial:
+            removed = [path for path, meta in current.items() if meta is None and path in self.files]
+        else:
+            removed = [path for path in self.files if path not in current]
+        changed = [path for path, meta in current.items()
+                   if meta is not None and self.files.get(path) != meta]
+
+        for path in removed:
+            self._remove_file(path)
+        for path in changed:
+            if path in self.files:
+                self._remove_file(path)
+        if len(self.doc_ids) < len(self.doc_paths) * (1 - COMPACT_RATIO):
+            with self._timed('merge'):
+                self.compact()
+
+        index_start = time.time()
+        if self.memory_budget and changed:
+            self._segment_dir = tempfile.mkdtemp(prefix="search_segments_")
+            self._pending_bytes = sum(len(buf) + len(word) + TERM_OVERHEAD
+                                      for word, buf in self.index.items())
+
+        try:
+            if jobs > 1 and len(changed) > 1:
+                self._index_parallel(changed, jobs)
+            else:
+                for path in changed:
+                    self._index_file(path)
+                    self._maybe_spill()
+            for path in changed:
+                self.files[path] = current[path]
+            if changed or removed:
+                self.generation += 1
+            if self._segments:
+                with self._timed('merge'):
+                    self._merge_segments()
+        finally:
+            if self._segment_dir:
+                shutil.rmtree(self._segment_dir, ignore_errors=True)
+            self._segment_dir = None
+            self._segments = []
+        index_duration = time.time() - index_start
+        return changed, removed, index_duration
+
+    def _index_parallel(self, paths, jobs):
+        """Index paths on a process pool and merge the per-worker partial indexes."""
+        # Enough batches to keep every worker busy, small enough to balance load
+        size = max(1, min(BATCH_SIZE, len(paths) // (jobs * 4)))
+        batches = [paths[i:i + size] for i in range(0, len(paths), size)]
+
+        with_trigrams = [self.trigrams is not None] * len(batches)
+        with_code_terms = [self.code_terms] * len(batches)
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for partial in pool.map(_index_batch, batches, with_trigrams, with_code_terms):
+                with self._timed('merge'):
+                    self.merge(partial)
+                self._maybe_spill()
+
+    def _maybe_spill(self):
+        if self._segment_dir and self._pending_bytes > self.memory_budget:
+            with self._timed('merge'):
+                self._spill()
+
+    def _spill(self):
+        """Flush in-memory postings to a sorted segment file and start afresh.
+
+        last_doc stays in memory, so the postings of later segments keep
+        gap-encoding from where the earlier ones stopped and merging a term
+        is plain concatenation in segment order.
+        """
+        path = os.path.join(self._segment_dir, f"segment_{len(self._segments):05d}.seg")
+        write_segment(path, ((word, self.index[word]) for word in sorted(self.index)))
+        self._segments.append(path)
+        self.index = {}
+        self._term_dict = None
+        self._pending_bytes = 0
+
+    def _merge_segments(self):
+        """k-way merge all spilled segments plus the in-memory rest.
+
+        With an index file to save to, the merge streams term by term into
+        the file writer and the result is mapped as the new base, so the
+        merged postings are never all in memory. Without one (or if writing
+        fails) they are merged into self.index.
+        """
+        if self.index_path and self._save(self.index_path, self.root_dir, self._merged_terms()):
+            return
+        index = {}
+        for term, postings, _, _ in self._merged_terms(with_base=False):
+            index[term] = bytearray(postings)
+        self.index = index
+        self._term_dict = None
+
+    def _merged_terms(self, with_base=True):
+        """Yield (term, postings, last doc, skip table of a prefix or None) in
+        term order from segments, memory and base.
+
+        A term written since the base was saved already starts with a copy of
+        its base postings (see _writable), so the base only supplies terms
+        that were not touched, and the skip table of that copy.
+        """
+        # Tagging entries with their segment number keeps chronological order per term
+        streams = [((term, n, postings, None) for term, postings in read_segment(path))
+                   for n, path in enumerate(self._segments)]
+        streams.append((term, len(self._segments), postings, None)
+                       for term, postings in sorted(self.index.items()))
+        if with_base and self.base is not None:
+            streams.append((term, -1, postings, (last_doc, skips))
+                           for term, postings, last_doc, skips in self.base.items())
+        merged = heapq.merge(*streams, key=lambda entry: (entry[0], entry[1]))
+        for term, entries in itertools.groupby(merged, key=lambda entry: entry[0]):
+            entries = list(entries)
+            base_entry = None
+            if entries[0][1] == -1:
+                base_entry = entries[0]
+                if len(entries) == 1:
+                    yield term, base_entry[2], base_entry[3][0], base_entry[3][1]
+                    continue
+                entries = entries[1:]
+            postings = b''.join(entry[2] for entry in entries)
+            known = None
+            if base_entry is not None and postings.startswith(base_entry[2]):
+                known = base_entry[3][1]
+            yield term, postings, self.last_doc[term], known
+
+    def merge(self, partial):
+        """Merge a partial index built from other files into this one.
+
+        The partial's doc ids are shifted past ours; since postings are gap
+        encoded only the first gap of every partial buffer has to be rewritten.
+        """
+        offset = len(self.doc_paths)
+        # Worker-side read/tokenize/insert time and bytes count as ours
+        self.phase_times.update(partial.phase_times)
+        self.bytes_read += partial.bytes_read
+        self.doc_paths.extend(partial.doc_paths)
+        self.doc_lengths.extend(partial.doc_lengths)
+        self.total_length += partial.total_length
+        self.num_postings += partial.num_postings
+        for doc_id, path in enumerate(partial.doc_paths):
+            if path is not None:
+                self.doc_ids[path] = doc_id + offset
+
+        for word, postings in partial.index.items():
+            first_doc, pos = _read_varint(postings, 0)
+            buf = self._writable(word)
+            _append_varint(buf, first_doc + offset - self.last_doc.get(word, 0))
+            buf += postings[pos:]
+            self._pending_bytes += len(postings)
+            self.last_doc[word] = partial.last_doc[word] + offset
+        self.doc_offsets.extend(partial.doc_offsets)
+
+        if self.trigrams is not None:
+            # New doc ids are larger than the base ones, so appending keeps order
+            for gram, doc_ids in partial.trigrams.items():
+                if gram not in self.trigrams:
+                    self.trigrams[gram] = array('I')
+                self.trigrams[gram].extend(doc_id + offset for doc_id in doc_ids)
+
+    def _remove_file(self, filepath):
+        """Drop a file from the index (used for deleted/modified files).
+
+        The doc id is only tombstoned; its postings are skipped at query time
+        and physically removed by compact().
+        """
+        doc_id = self.doc_ids.pop(filepath, None)
+        if doc_id is not None:
+            self.doc_paths[doc_id] = None
+            self.total_length -= self.doc_lengths[doc_id]
+            self.doc_offsets[doc_id] = None
+        self.files.pop(filepath, None)
+
+    def compact(self):
+        """Rewrite all postings without tombstoned docs and renumber doc ids densely."""
+        self.generation += 1
+        remap = {}
+        live_paths = []
+        live_lengths = array('I')
+        live_offsets = []
+        for doc_id, path in enumerate(self.doc_paths):
+            if path is not None:
+                remap[doc_id] = len(live_paths)
+                live_paths.append(path)
+                live_lengths.append(self.doc_lengths[doc_id])
+                live_offsets.append(self.line_offsets(doc_id))
+
+        old_postings = {word: self.term_postings(word) for word in self.vocabulary()}
+        self.index = {}
+        self.last_doc = {}
+        self._term_dict = None
+        self.num_postings = 0
+        for word, postings in old_postings.items():
+            buf = None
+            prev = 0
+            for doc_id, tf, start, end in iter_blocks(postings):
+                new_id = remap.get(doc_id)
+                if new_id is None:
+                    continue
+                if buf is None:
+                    buf = self.index[word] = bytearray()
+                # Line gaps are relative within the block, copy them verbatim
+                _append_varint(buf, new_id - prev)
+                _append_varint(buf, tf)
+                _append_varint(buf, end - start)
+                block = postings[start:end]
+                buf += block
+                # One line gap per posting, i.e. one varint end byte (< 0x80) each
+                self.num_postings += len(block) - len(bytes(block).translate(None, VARINT_END_BYTES))
+                prev = new_id
+            if buf is not None:
+                self.last_doc[word] = prev
+
+        if self.trigrams is not None:
+            grams = set(self.trigrams)
+            if self.base is not None:
+                grams.update(self.base.trigrams())
+            old_trigrams = {gram: self.trigram_docs(gram) for gram in grams}
+            self.trigrams = {}
+            for gram, doc_ids in old_trigrams.items():
+                live = array('I', (remap[doc_id] for doc_id in doc_ids if doc_id in remap))
+                if live:
+                    self.trigrams[gram] = live
+
+        # Doc ids changed, everything now lives in memory until the next save
+        if self.base is not None:
+            self.base.close()
+            self.base = None
+
+        self.doc_paths = live_paths
+        self.doc_lengths = live_lengths
+        self.doc_offsets = live_offsets
+        self.doc_ids = {path: doc_id for doc_id, path in enumerate(live_paths)}
+
+    def _writable(self, word):
+        """In-memory postings buffer of word, ready for appending.
+
+        The first write to a word since the index was loaded copies its base
+        postings; afterwards last_doc has the word, so a buffer emptied by a
+        SPIMI spill starts fresh instead of copying the base twice.
+        """
+        buf = self.index.get(word)
+        if buf is None:
+            buf = self.index[word] = bytearray()
+            self._pending_bytes += len(word) + TERM_OVERHEAD
+            if word not in self.last_doc:
+                base_postings = self.base.get(word) if self.base is not None else None
+                if base_postings is None:
+                    if self._term_dict is not None:
+                        self._term_dict.add(word) # brand new word
+                else:
+                    buf += base_postings
+                    self.last_doc[word] = self.base.last_doc(word)
+                    self._pending_bytes += len(base_postings)
+        return buf
+
+    def term_postings(self, word):
+        """Postings buffer of word (in memory or from the mapped base), or None."""
+        buf = self.index.get(word)
+        if buf is None and self.base is not None:
+            buf = self.base.get(word)
+        return buf
+
+    def term_skips(self, word):
+        """Skip table of word's base postings, or None.
+
+        It also holds for an in-memory buffer of the word, since that starts
+        with a copy of the base postings (see _writable).
+        """
+        return self.base.skip_table(word) if self.base is not None else None
+
+    def vocabulary(self):
+        """Set of all indexed words."""
+        words = set(self.index)
+        if self.base is not None:
+            words.update(self.base.terms())
+        return words
+
+    def term_count(self):
+        if self.base is None:
+            return len(self.index)
+        return len(self.base) + sum(1 for word in self.index if word not in self.base)
+
+    def line_offsets(self, doc_id):
+        """Line start offsets of a doc, decoded from the base on demand."""
+        offsets = self.doc_offsets[doc_id]
+        if offsets is None and self.base is not None:
+            offsets = self.base.line_offsets(doc_id)
+        return offsets
+
+    def trigram_docs(self, gram):
+        """Sorted doc ids whose content contains gram."""
+        doc_ids = self.trigrams.get(gram)
+        if self.base is None:
+            return doc_ids if doc_ids is not None else array('I')
+        base_ids = self.base.trigram_docs(gram)
+        if doc_ids is not None:
+            base_ids.extend(doc_ids)
+        return base_ids
+
+    def _append_postings(self, word, doc_id, tf, line_nums):
+        """Append one document block (sorted line numbers) to a word's postings."""
+        buf = self._writable(word)
+        block = bytearray()
+        prev = 0
+        for line_num in line_nums:
+            _append_varint(block, line_num - prev)
+            prev = line_num
+        _append_varint(buf, doc_id - self.last_doc.get(word, 0))
+        _append_varint(buf, tf)
+        _append_varint(buf, len(block))
+        buf += block
+        self.last_doc[word] = doc_id
+        self.num_postings += len(line_nums)
+        self._pending_bytes += len(block) + 4
 
     def _index_file(self, filepath):
+        start = time.perf_counter()
         try:
-            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-                self.documents[filepath] = lines
-                
-                for line_num, line in enumerate(lines, 1):
-                    words = self.clean_text(line)
-                    for word in set(words): # Use set to avoid duplicate hits per line
-                        if word not in self.index:
-                            self.index[word] = []
-                        self.index[word].append((filepath, line_num))
+            with open(filepath, 'rb') as f:
+                data = f.read()
         except Exception:
             # Skip unreadable files
-            pass
+            return
+        self.bytes_read += len(data)
+        read_done = time.perf_counter()
+
+        # Only line start offsets are kept; snippets are re-read from disk
+        offsets = array('I' if len(data) < 2**32 else 'Q')
+        offsets.append(0)
+        offsets.extend(m.end() for m in NEWLINE_RE.finditer(data))
+        if offsets[-1] == len(data):
+            offsets.pop() # trailing newline does not start a new line
+
+        doc_id = len(self.doc_paths)
+        self.doc_paths.append(filepath)
+        self.doc_ids[filepath] = doc_id
+        self.doc_offsets.append(offsets)
+
+        # Tokenize the whole buffer at once; newline tokens advance the line number
+        tokens = self.tokenize(data.decode('utf-8', errors='ignore'))
+        term_freqs = Counter(tokens)
+        num_tokens = len(tokens) - term_freqs.pop('\n', 0)
+        hits = {} # {word: [line_num, ...]} for this file only
+        line_num = 1
+        for word in tokens:
+            if word == '\n':
+                line_num += 1
+                continue
+            line_nums = hits.get(word)
+            if line_nums is None:
+                hits[word] = [line_num]
+            elif line_nums[-1] != line_num: # one hit per line
+                line_nums.append(line_num)
+        tokenize_done = time.perf_counter()
+
+        for word, line_nums in hits.items():
+            self._append_postings(word, doc_id, term_freqs[word], line_nums)
+        self.doc_lengths.append(num_tokens)
+        self.total_length += num_tokens
+
+        if self.trigrams is not None:
+            lowered = data.lower()
+            for gram in {lowered[i:i + 3] for i in range(len(lowered) - 2)}:
+                doc_ids = self.trigrams.get(gram)
+                if doc_ids is None:
+                    doc_ids = self.trigrams[gram] = array('I')
+                doc_ids.append(doc_id)
+
+        self.phase_times['read'] += read_done - start
+        self.phase_times['tokenize'] += tokenize_done - read_done
+        self.phase_times['insert'] += time.perf_counter() - tokenize_done
+
+    def postings(self, word):
+        """Yield (path, line_num) for a word, skipping deleted documents."""
+        buf = self.term_postings(word)
+        if not buf:
+            return
+        doc_paths = self.doc_paths
+        for doc_id, line_num in iter_postings(buf):
+            path = doc_paths[doc_id]
+            if path is not None:
+                yield path, line_num
+
+    def postings_bytes(self):
+        """Bytes used by all postings buffers, from buffer and term entry lengths."""
+        size = 0
+        # Snapshot so a concurrent update cannot change the dict while we iterate
+        for word, buf in list(self.index.items()):
+            size += len(buf)
+            if self.base is not None:
+                # An in-memory buffer shadows (and starts with a copy of) the base postings
+                size -= self.base.postings_size(word)
+        if self.base is not None:
+            size += self.base.postings_bytes
+        return size
+
+    def memory_usage(self):
+        """Return (postings count, bytes used by postings buffers)."""
+        return self.num_postings, self.postings_bytes()
+
+    def memory_estimate(self):
+        """Approximate resident bytes (the mapped base file is not counted)."""
+        size = sum(len(buf) + len(word) + TERM_OVERHEAD for word, buf in self.index.items())
+        size += sum(offsets.itemsize * len(offsets) for offsets in self.doc_offsets if offsets is not None)
+        size += sum(len(path) + DOC_OVERHEAD for path in self.doc_ids)
+        size += self.doc_lengths.itemsize * len(self.doc_lengths)
+        if self.trigrams:
+            size += sum(doc_ids.itemsize * len(doc_ids) + TERM_OVERHEAD for doc_ids in self.trigrams.values())
+        return size
+
+    def stats(self):
+        """Index, indexing-phase and query statistics as a JSON-serializable dict."""
+        postings, postings_bytes = self.memory_usage()
+        histogram = {}
+        for bound in LATENCY_BUCKETS_MS:
+            histogram[f"<={bound}"] = self.query_latencies[bound]
+        histogram[f">{LATENCY_BUCKETS_MS[-1]}"] = self.query_latencies[None]
+        return {
+            "files": len(self.doc_ids),
+            "terms": self.term_count(),
+            "postings": postings,
+            "postings_bytes": postings_bytes,
+            "memory_bytes": self.memory_estimate(),
+            "index_file_bytes": os.path.getsize(self.base.path) if self.base is not None else 0,
+            "bytes_read": self.bytes_read,
+            "phase_seconds": {phase: round(self.phase_times[phase], 4) for phase in PHASES},
+            "queries": sum(self.query_latencies.values()),
+            "query_latency_ms": histogram,
+            "generation": self.generation,
+            "cache": self.cache_stats(),
+        }
+
+    def save(self, index_path, root_dir):
+        """Write the index as a binary file and map it as the new base.
+
+        In-memory postings are released afterwards, so after a save resident
+        memory is mostly the doc table.
+        """
+        with self._timed('save'):
+            self._save(index_path, root_dir)
+
+    def _save(self, index_path, root_dir, terms=None):
+        """Save (see save()); terms overrides the postings source. Returns success."""
+        tmp_path = index_path + ".tmp"
+        try:
+            self._write_index_file(tmp_path, root_dir, terms)
+        except OSError as e:
+            console.print(f"[yellow]Could not save index to {index_path}: {e}[/yellow]")
+            return False
+
+        # The old base must be unmapped before its file can be replaced
+        old_path = self.base.path if self.base is not None else None
+        self._term_dict = None # it may read the old base's term table
+        if self.base is not None:
+            self.base.close()
+            self.base = None
+        try:
+            # Atomic replace so a crash never leaves a half-written index
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            console.print(f"[yellow]Could not save index to {index_path}: {e}[/yellow]")
+            if old_path:
+                self.base = MappedIndex(old_path)
+            return False
+
+        self.base = MappedIndex(index_path)
+        self.index = {}
+        self.last_doc = {}
+        self.doc_offsets = [None] * len(self.doc_paths)
+        if self.trigrams is not None:
+            self.trigrams = {}
+        self.saved_generation = self.generation
+        return True
+
+    def _write_index_file(self, path, root_dir, terms=None):
+        """Write the binary index file; terms is an iterable like _merged_terms()
+        sorted by utf-8 bytes (default: the whole index)."""
+        meta = json.dumps({"root": os.path.abspath(root_dir)}).encode('utf-8')
+        paths = '\0'.join(path or '' for path in self.doc_paths).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(b'\0' * INDEX_HEADER.size) # header is filled in last
+            meta_off = f.tell()
+            f.write(meta)
+            paths_off = f.tell()
+            f.write(paths)
+
+            doc_entries = bytearray()
+            for doc_id, doc_path in enumerate(self.doc_paths):
+                size, mtime_ns = self.files.get(doc_path, (0, 0))
+                offsets = self.line_offsets(doc_id) if doc_path is not None else array('I')
+                doc_entries += DOC_ENTRY.pack(size, mtime_ns, self.doc_lengths[doc_id], len(offsets),
+                                              f.tell(), offsets.typecode.encode('ascii'))
+                offsets.tofile(f)
+            docs_off = f.tell()
+            f.write(doc_entries)
+
+            term_entries = bytearray()
+            term_blob = bytearray()
+            num_terms = 0
+            postings_bytes = 0
+            for word, postings, last_doc, known in (self._merged_terms() if terms is None else terms):
+                num_terms += 1
+                postings_bytes += len(postings)
+                doc_count, skip_docs, skip_offsets = postings_skips(postings, known)
+                encoded = word.encode('utf-8')
+                postings_off = f.tell()
+                f.write(postings)
+                skips_off = f.tell()
+                skip_docs.tofile(f)
+                skip_offsets.tofile(f)
+                term_entries += TERM_ENTRY.pack(len(term_blob), len(encoded), postings_off, len(postings),
+                                                last_doc, doc_count, skips_off, len(skip_docs))
+                term_blob += encoded
+            term_blob_off = f.tell()
+            f.write(term_blob)
+            terms_off = f.tell()
+            f.write(term_entries)
+
+            trigram_entries = bytearray()
+            grams = []
+            if self.trigrams is not None:
+                grams = set(self.trigrams)
+                if self.base is not None:
+                    grams.update(self.base.trigrams())
+                grams = sorted(grams)
+                for gram in grams:
+                    doc_ids = self.trigram_docs(gram)
+                    trigram_entries += TRIGRAM_ENTRY.pack(gram, f.tell(), len(doc_ids))
+                    doc_ids.tofile(f)
+            trigrams_off = f.tell()
+            f.write(trigram_entries)
+
+            f.seek(0)
+            f.write(INDEX_HEADER.pack(
+                INDEX_MAGIC, INDEX_VERSION,
+                (FLAG_TRIGRAMS if self.trigrams is not None else 0) | (FLAG_CODE_TERMS if self.code_terms else 0),
+                len(self.doc_paths), num_terms, len(grams), self.total_length,
+                meta_off, len(meta), paths_off, len(paths), docs_off, terms_off,
+                term_blob_off, trigrams_off, self.num_postings, postings_bytes))
+
+    def load(self, index_path, root_dir):
+        """Map a saved index. Returns False (and keeps an empty index) if unusable.
+
+        Only the doc table is decoded here; postings, line offsets and
+        trigrams are read from the mapped file when a query needs them.
+        """
+        try:
+            base = MappedIndex(index_path)
+        except (OSError, ValueError):
+            console.print("[yellow]Saved index is unreadable, rebuilding.[/yellow]")
+            return False
+
+        if (base.version != INDEX_VERSION or base.meta.get("root") != os.path.abspath(root_dir)
+                or bool(base.flags & FLAG_TRIGRAMS) != (self.trigrams is not None)
+                or bool(base.flags & FLAG_CODE_TERMS) != self.code_terms):
+            base.close()
+            console.print("[yellow]Saved index is outdated, rebuilding.[/yellow]")
+            return False
+        self._attach(base)
+        return True
+
+    def _attach(self, base):
+        """Make a MappedIndex the base and reset the in-memory overlay."""
+        self.base = base
+        self.index = {}
+        self.last_doc = {}
+        self._term_dict = None
+        self.doc_paths, self.doc_lengths, self.files = base.doc_table()
+        self.doc_ids = {path: doc_id for doc_id, path in enumerate(self.doc_paths) if path is not None}
+        self.doc_offsets = [None] * len(self.doc_paths)
+        self.total_length = base.total_length
+        self.num_postings = base.num_postings
+        if self.trigrams is not None:
+            self.trigrams = {}
+        self.generation += 1
+        self.saved_generation = self.generation
+
+    def get_line(self, path, line_num):
+        """Return the text of a 1-indexed line of an indexed file, read from disk."""
+        reader = LineReader(self)
+        try:
+            return reader.read(path, line_num)
+        finally:
+            reader.close()
+
+    def parse_query(self, query):
+        """Parse a query into a tree of tuples.
+
+        Syntax: words are ANDed, `OR` joins alternatives, `NOT x` / `-x`
+        excludes a word, phrase, regex or group, "quoted text" is a phrase
+        and (parentheses) group.
+        `conf*` / `c?nfig` expand to matching index terms, `word~` / `word~2`
+        to terms within that many typos. `/regex/` (or `/regex/i`) matches
+        raw line text.
+        Nodes: ('term', w), ('phrase', [w, ...]), ('regex', compiled),
+        ('or', [nodes]), ('and', [nodes], [excluded nodes]).
+        """
+        tokens = QUERY_TOKEN_RE.findall(query)
+        node, _ = self._parse_or(tokens, 0)
+        return node
+
+    def _parse_or(self, tokens, pos):
+        options = []
+        node, pos = self._parse_and(tokens, pos)
+        if node:
+            options.append(node)
+        while pos < len(tokens) and tokens[pos] == 'OR':
+            node, pos = self._parse_and(tokens, pos + 1)
+            if node:
+                options.append(node)
+        if not options:
+            return None, pos
+        return (options[0] if len(options) == 1 else ('or', options)), pos
+
+    def _parse_and(self, tokens, pos):
+        required = []
+        excluded = []
+        while pos < len(tokens) and tokens[pos] not in ('OR', ')'):
+            token = tokens[pos]
+            negate = False
+            if token == 'AND':
+                pos += 1
+                continue
+            if token == 'NOT' or (token.startswith('-') and len(token) > 1):
+                negate = True
+                if token == 'NOT':
+                    pos += 1
+                    if pos >= len(tokens):
+                        break
+                    token = tokens[pos]
+                else:
+                    token = token[1:]
+
+            if token == '(':
+                node, pos = self._parse_or(tokens, pos + 1)
+                pos += 1 # closing parenthesis
+            elif REGEX_TOKEN_RE.fullmatch(token):
+                node = self._regex_node(*REGEX_TOKEN_RE.fullmatch(token).groups())
+                pos += 1
+            elif WILDCARD_RE.fullmatch(token):
+                node = self._expand_node(self.term_dictionary().wildcard(token.lower()))
+                pos += 1
+            elif FUZZY_RE.fullmatch(token):
+                word, dist = FUZZY_RE.fullmatch(token.lower()).groups()
+                node = self._fuzzy_node(word, int(dist) if dist else auto_fuzziness(word))
+                pos += 1
+            else:
+                words = self.clean_text(token.strip('"'))
+                if not words:
+                    node = None
+                elif len(words) == 1:
+                    node = ('term', words[0])
+                    if self.fuzzy and self.term_postings(words[0]) is None:
+                        node = self._fuzzy_node(words[0], auto_fuzziness(words[0]))
+                else:
+                    node = ('phrase', words)
+                pos += 1
+
+            if node:
+                (excluded if negate else required).append(node)
+
+        if not required:
+            # A purely negative query (NOT x) matches nothing on its own
+            return None, pos
+        if len(required) == 1 and not excluded:
+            return required[0], pos
+        return ('and', required, excluded), pos
+
+    def term_dictionary(self):
+        """Sorted term dictionary for prefix/wildcard/fuzzy lookups.
+
+        With a base it reads the mapped term table in place and words written
+        since the base was saved are added to its overlay.
+        """
+        if self._term_dict is None:
+            if self.base is None:
+                self._term_dict = TermDictionary(sorted(self.index))
+            else:
+                self._term_dict = TermDictionary(MappedTerms(self.base))
+                for word in self.index:
+                    if word not in self.base:
+                        self._term_dict.add(word)
+        return self._term_dict
+
+    def _expand_node(self, terms):
+        """OR node over the first MAX_EXPANSIONS terms (None if there are none)."""
+        nodes = []
+        for term in terms:
+            nodes.append(('term', term))
+            if len(nodes) >= MAX_EXPANSIONS:
+                break
+        if not nodes:
+            return ('term', '') # matches nothing, but keeps the AND strict
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def _fuzzy_node(self, word, max_dist):
+        if max_dist == 0:
+            return ('term', word)
+        return self._expand_node(self.term_dictionary().fuzzy(word, max_dist))
+
+    def _regex_node(self, pattern, flags):
+        try:
+            compiled = re.compile(pattern.encode('utf-8'),
+                                  re.MULTILINE | (re.IGNORECASE if flags else 0))
+        except re.error as e:
+            console.print(f"[red]Invalid regex /{pattern}/: {e}[/red]")
+            return None
+        return ('regex', compiled)
+
+    def regex_candidates(self, pattern):
+        """Sorted live doc ids that may match a (bytes) regex.
+
+        Uses the trigram index when available: every trigram of every literal
+        the regex requires must occur in the file. Otherwise all docs qualify.
+        """
+        doc_paths = self.doc_paths
+        candidates = None
+        if self.trigrams is not None:
+            # Lowered like the index (bytes.lower, ASCII only); under /i a
+            # non-ASCII literal may match in another case, so it is not required
+            literals = [lit.encode('utf-8').lower() for lit in regex_literals(pattern.pattern.decode('utf-8'))
+                        if not (pattern.flags & re.IGNORECASE) or lit.isascii()]
+            if pattern.flags & re.VERBOSE:
+                literals = []
+            grams = {lit[i:i + 3] for lit in literals for i in range(len(lit) - 2)}
+            postings = {gram: self.trigram_docs(gram) for gram in grams}
+            for gram in sorted(grams, key=lambda g: len(postings[g])):
+                doc_ids = set(postings[gram])
+                candidates = doc_ids if candidates is None else candidates & doc_ids
+                if not candidates:
+                    return []
+        if candidates is None:
+            candidates = range(len(doc_paths))
+        return sorted(doc_id for doc_id in candidates if doc_paths[doc_id] is not None)
+
+    def _matcher(self, node, reader):
+        """Build a matcher for a parsed query node (reader serves phrase checks)."""
+        kind = node[0]
+        if kind == 'term':
+            buf = self.term_postings(node[1])
+            if buf is None:
+                return EmptyMatcher()
+            skips = self.term_skips(node[1])
+            return PostingsCursor(buf, self.doc_paths, skips[3:] if skips else None)
+        if kind == 'regex':
+            return RegexMatcher(self, node[1], self.regex_candidates(node[1]))
+        if kind == 'or':
+            return OrMatcher([self._matcher(child, reader) for child in node[1]])
+        if kind == 'and':
+            return AndMatcher([self._matcher(child, reader) for child in node[1]],
+                              [self._matcher(child, reader) for child in node[2]])
+        # phrase: all words on the line, then check they are adjacent in the text
+        words = node[1]
+        pattern = re.compile(r'\b' + r'\W+'.join(map(re.escape, words)) + r'\b', re.IGNORECASE)
+        doc_paths = self.doc_paths
+
+        def is_phrase(key):
+            line = reader.read(doc_paths[key >> LINE_BITS], key & ((1 << LINE_BITS) - 1))
+            return pattern.search(line) is not None
+
+        inner = AndMatcher([self._matcher(('term', word), reader) for word in words])
+        return FilterMatcher(inner, is_phrase)
 
     def search(self, query):
-        """Search for a query string."""
-        terms = self.clean_text(query)
-        if not terms:
-            return {}
+        """Search for a query string. Returns matching (path, line_num) pairs.
 
-        # Simple AND search: must contain all terms (or at least first term for now)
-        # Let's do single term search or finding intersection for multiple
-        
-        # Start with results for first term
-        first_term = terms[0]
-        results = self.index.get(first_term, [])
-        
-        # Filter for subsequent terms (AND logic)
-        for term in terms[1:]:
-            term_results = self.index.get(term, [])
-            # Inefficient intersection but works for small scale
-            # We need to intersect based on (filepath, line_num)? 
-            # Or just filepath? Usually search engines match document. 
-            # But here we index lines.
-            
-            # Let's stick to simple "matches any" OR logic for simplicity, 
-            # or strict AND. Let's do exact match of first term for MVP.
-            pass
-            
+        Terms are matched per line: `a b` finds lines containing both words.
+        """
+        start = time.perf_counter()
+        try:
+            return self._search(query)
+        finally:
+            self._record_latency((time.perf_counter() - start) * 1000)
+
+    def _record_latency(self, ms):
+        bucket = next((bound for bound in LATENCY_BUCKETS_MS if ms <= bound), None)
+        with _cache_lock:
+            self.query_latencies[bucket] += 1
+
+    def _search(self, query):
+        node = self.parse_query(query)
+        if node is None:
+            return []
+
+        cache_key = _freeze(node)
+        results = self._cache_get(cache_key)
+        if results is not None:
+            return results
+
+        reader = LineReader(self)
+        try:
+            matcher = self._matcher(node, reader)
+            doc_paths = self.doc_paths
+            line_mask = (1 << LINE_BITS) - 1
+            results = []
+            while matcher.key is not None:
+                key = matcher.key
+                results.append((doc_paths[key >> LINE_BITS], key & line_mask))
+                matcher.advance()
+        finally:
+            reader.close()
+        self._cache_put(cache_key, results)
         return results
 
-    def display_results(self, query, results):
-        if not results:
-            console.print("[red]No results found.[/red]")
+    def _cache_get(self, key):
+        with _cache_lock:
+            if self._cache_generation != self.generation:
+                # The index changed since these results were computed
+                self._cache.clear()
+                self._cache_size = 0
+                self._cache_generation = self.generation
+            results = self._cache.get(key)
+            if results is None:
+                self.cache_misses += 1
+                return None
+            self.cache_hits += 1
+            self._cache.move_to_end(key)
+            return results
+
+    def _cache_put(self, key, results):
+        size = len(results) + 1
+        if size > QUERY_CACHE_SIZE:
+            return # would evict everything else
+        with _cache_lock:
+            if key in self._cache:
+                return # another thread got there first
+            self._cache[key] = results
+            self._cache_size += size
+            while self._cache_size > QUERY_CACHE_SIZE:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_size -= len(evicted) + 1
+
+    def cache_stats(self):
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "entries": len(self._cache),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _scoring_terms(self, node):
+        """Words that contribute to relevance (excluded words never do)."""
+        kind = node[0]
+        if kind == 'term':
+            return [node[1]]
+        if kind == 'phrase':
+            return list(node[1])
+        if kind == 'regex':
+            return []
+        words = []
+        for child in node[1]:
+            words.extend(self._scoring_terms(child))
+        return words
+
+    def document_frequency(self, word):
+        """Number of live documents containing word."""
+        doc_paths = self.doc_paths
+        buf = self.term_postings(word) or b''
+        if len(self.doc_ids) == len(doc_paths):
+            # No deleted docs: the saved doc count plus the blocks appended since
+            return postings_skips(buf, self.term_skips(word))[0]
+        return sum(1 for doc_id, _, _, _ in iter_blocks(buf) if doc_paths[doc_id] is not None)
+
+    def rank(self, query, results, k=10):
+        """Score the files in results with BM25 and return the best k.
+
+        Returns [(score, path, [line_nums])] sorted by descending score.
+        """
+        # Heap selection keeps only k candidates instead of sorting every file
+        return heapq.nlargest(k, self._scored(query, results), key=lambda item: item[0])
+
+    def iter_ranked(self, query, results):
+        """Like rank(), but yields every file lazily in descending score order.
+
+        All files are scored once and heapified, then popped one at a time,
+        so showing the first page of thousands of hits does not sort them all.
+        """
+        # (-score, position) keeps ties in the same order as rank()
+        heap = [(-score, i, path, line_nums)
+                for i, (score, path, line_nums) in enumerate(self._scored(query, results))]
+        heapq.heapify(heap)
+        while heap:
+            neg_score, _, path, line_nums = heapq.heappop(heap)
+            yield -neg_score, path, line_nums
+
+    def _scored(self, query, results):
+        """Yield (BM25 score, path, [line_nums]) per file, in doc id order."""
+        node = self.parse_query(query)
+        if node is None or not results:
             return
 
-        # Group by file
+        # Group by file (results are already in doc id order)
         grouped = {}
         for path, line_num in results:
             if path not in grouped:
                 grouped[path] = []
             grouped[path].append(line_num)
 
-        console.print(f"\nFound matches in [bold]{len(grouped)}[/bold] files:\n")
+        num_docs = len(self.doc_ids)
+        avg_length = self.total_length / num_docs if num_docs else 0
+        terms = []
+        for word in set(self._scoring_terms(node)):
+            buf = self.term_postings(word)
+            if buf is not None:
+                df = self.document_frequency(word)
+                idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+                skips = self.term_skips(word)
+                terms.append((idf, PostingsCursor(buf, self.doc_paths, skips[3:] if skips else None)))
 
         for path, line_nums in grouped.items():
-            console.print(Panel(f"[bold blue]{path}[/bold blue]"))
-            
-            # Show top 3 matches per file to avoid spam
-            lines = self.documents[path]
-            for ln in line_nums[:3]:
-                # 0-indexed list, 1-indexed line_num
-                content = lines[ln-1].strip()
-                # Highlight query
-                highlighted = content.replace(query, f"[black on yellow]{query}[/black on yellow]")
-                console.print(f"  [dim]{ln}:[/dim] {highlighted}")
-            
-            if len(line_nums) > 3:
-                console.print(f"  [dim]... and {len(line_nums)-3} more lines.[/dim]")
-            print()
+            doc_id = self.doc_ids[path]
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / (avg_length or 1))
+            score = 0.0
+            for idf, cursor in terms:
+                # Docs arrive in increasing order, so each cursor only moves forward
+                cursor.seek(doc_id << LINE_BITS)
+                if cursor.key is not None and cursor.doc_id == doc_id:
+                    score += idf * cursor.tf * (BM25_K1 + 1) / (cursor.tf + norm)
+            yield score, path, line_nums
+
+    def run_query(self, query, k=10, snippets=3):
+        """Search + rank and return a JSON-serializable result dict."""
+        start = time.perf_counter()
+        results = self.search(query)
+        ranked = self.rank(query, results, k)
+        reader = LineReader(self)
+        try:
+            files = [{
+                "path": path,
+                "score": round(score, 4),
+                "matches": len(line_nums),
+                "lines": [{"line": ln, "text": reader.read(path, ln).rstrip('\r\n')}
+                          for ln in line_nums[:snippets]],
+            } for score, path, line_nums in ranked]
+        finally:
+            reader.close()
+        return {
+            "query": query,
+            "total_files": len({path for path, _ in results}),
+            "results": files,
+            "took_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    def highlighter(self, query):
+        """Case-insensitive Aho-Corasick automaton over the query's words."""
+        node = self.parse_query(query)
+        words = set(self._scoring_terms(node)) if node is not None else ()
+        return AhoCorasick(word for word in words if word)
+
+    def highlight(self, line, automaton):
+        """Rich Text of line with every query word highlighted."""
+        lowered = line.lower()
+        if len(lowered) != len(line):
+            # Some characters grow when lowercased; keep those as they are
+            lowered = ''.join(c.lower() if len(c.lower()) == 1 else c for c in line)
+
+        spans = sorted(automaton.find(lowered), key=lambda span: (span[0], -span[1]))
+        text = Text(line)
+        last_end = 0
+        for start, end in spans:
+            if start < last_end:
+                continue # overlaps a longer, earlier match
+            # Whole words only, unless identifier parts are indexed as well
+            if not self.code_terms and (
+                    (start > 0 and _is_word_char(line[start - 1]))
+                    or (end < len(line) and _is_word_char(line[end]))):
+                continue
+            text.stylize("black on yellow", start, end)
+            last_end = end
+        return text
+
+    def display_results(self, query, results, k=10):
+        """Print ranked results k files at a time, asking before each next page."""
+        if not results:
+            console.print("[red]No results found.[/red]")
+            return
+
+        num_files = len({path for path, _ in results})
+        console.print(f"\nFound matches in [bold]{num_files}[/bold] files:\n")
+
+        automaton = self.highlighter(query)
+        reader = LineReader(self)
+        try:
+            for shown, (score, path, line_nums) in enumerate(self.iter_ranked(query, results), 1):
+                console.print(Panel(f"[bold blue]{path}[/bold blue] [dim](score {score:.2f})[/dim]"))
+
+                # Show top 3 matches per file to avoid spam
+                for ln in line_nums[:3]:
+                    # Lines are fetched lazily from disk via the offset table
+                    content = reader.read(path, ln).strip()
+                    console.print(Text(f"  {ln}: ", style="dim") + self.highlight(content, automaton))
+
+                if len(line_nums) > 3:
+                    console.print(f"  [dim]... and {len(line_nums)-3} more lines.[/dim]")
+                print()
+
+                if shown % k == 0 and shown < num_files:
+                    answer = console.input(f"[dim]-- {shown}/{num_files} files, Enter for more, q to stop --[/dim] ")
+                    if answer.strip().lower() == 'q':
+                        break
+        finally:
+            reader.close()
+
+class AhoCorasick:
+    """Find all occurrences of many strings in one pass over a text."""
+
+    def __init__(self, patterns):
+        self.goto = [{}] # state -> {char: next state}; state 0 is the root
+        self.fail = [0] # state -> longest proper suffix that is also a state
+        self.out = [()] # state -> lengths of the patterns ending here
+        for pattern in patterns:
+            state = 0
+            for ch in pattern:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = self.goto[state][ch] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                state = nxt
+            self.out[state] += (len(pattern),)
+
+        # Breadth-first, so fail states are always finished before their users
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(ch, 0) if state else 0
+                self.out[nxt] += self.out[self.fail[nxt]]
+
+    def find(self, text):
+        """Yield (start, end) of every pattern occurrence."""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length in out[state]:
+                yield i + 1 - length, i + 1
+
+# ---- Daemon mode ----
+
+class SearchDaemon:
+    """Keep an InvertedIndex resident, follow file changes and answer queries.
+
+    Changes come from watchdog (inotify on Linux) when it is installed,
+    otherwise from a periodic stat pass. Queries are served as JSON over
+    loopback HTTP: GET /search?q=...&k=10 and GET /stats.
+    """
+
+    def __init__(self, engine, root_dir, index_path=None, poll_interval=2.0):
+        self.engine = engine
+        self.root_dir = root_dir
+        self.index_path = index_path
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock() # guards engine: queries vs. updates
+        self.pending = set() # paths reported by the watcher, not applied yet
+        self.rescan = False # a directory changed: do a full stat pass
+        self.pending_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.observer = None
+
+    def dispatch(self, event):
+        """watchdog callback (runs on the observer thread)."""
+        with self.pending_lock:
+            if event.is_directory:
+                # Folders appearing/moving/vanishing carry files without their
+                # own events: simpler and safer to rescan everything
+                if event.event_type in ('created', 'moved', 'deleted'):
+                    self.rescan = True
+                return
+            for path in (event.src_path, getattr(event, 'dest_path', '')):
+                if path and path.endswith(EXTENSIONS):
+                    self.pending.add(path)
+
+    def _updater(self):
+        """Apply queued changes (watch mode) or poll the tree (fallback)."""
+        interval = 0.2 if self.observer else self.poll_interval
+        while not self.stopped.wait(interval):
+            if self.observer:
+                with self.pending_lock:
+                    paths, self.pending = self.pending, set()
+                    rescan, self.rescan = self.rescan, False
+                if rescan:
+                    current, partial = self.engine.scan_files(self.root_dir), False
+                elif paths:
+                    current, partial = self.engine.stat_paths(paths), True
+                else:
+                    continue
+            else:
+                current, partial = self.engine.scan_files(self.root_dir), False
+
+            with self.lock:
+                changed, removed, _ = self.engine.refresh(current, partial=partial)
+            if changed or removed:
+                console.print(f"[dim]Index updated: {len(changed)} re-indexed, "
+                              f"{len(removed)} removed.[/dim]")
+
+    def start_watching(self):
+        if Observer is not None:
+            self.observer = Observer()
+            self.observer.schedule(self, self.root_dir, recursive=True)
+            self.observer.start()
+            console.print("[dim]Watching for changes (watchdog).[/dim]")
+        else:
+            console.print(f"[dim]watchdog not installed, polling every {self.poll_interval}s.[/dim]")
+        threading.Thread(target=self._updater, daemon=True).start()
+
+    def query(self, query, k=10):
+        with self.lock:
+            return self.engine.run_query(query, k)
+
+    def stats(self):
+        # Stats are counters and lengths, no need to block queries for them;
+        # only if an update swaps the index under us retry with the lock held
+        try:
+            return self.engine.stats()
+        except (RuntimeError, ValueError):
+            with self.lock:
+                return self.engine.stats()
+
+    def serve_forever(self, host="127.0.0.1", port=8765):
+        server = ThreadingHTTPServer((host, port), _QueryHandler)
+        server.search_daemon = self
+        # Stop cleanly (and save the index) on `kill` as well as Ctrl+C
+        signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+        self.start_watching()
+        console.print(f"[green]Serving queries on http://{host}:{port}/search?q=...[/green]")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stopped.set()
+            server.server_close()
+            if self.observer:
+                self.observer.stop()
+                self.observer.join()
+            if self.index_path:
+                with self.lock:
+                    self.engine.save(self.index_path, self.root_dir)
+
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        search_daemon = self.server.search_daemon
+        if url.path == '/search':
+            try:
+                k = int(params.get('k', ['10'])[0])
+            except ValueError:
+                k = 10
+            self._send(200, search_daemon.query(params.get('q', [''])[0], max(1, k)))
+        elif url.path == '/stats':
+            self._send(200, search_daemon.stats())
+        else:
+            self._send(404, {"error": "use /search?q=... or /stats"})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # keep the console for index updates
+
+# ---- Batch mode ----
+
+def open_index(index_path):
+    """Open a saved index read-only, whichever folder it was built from."""
+    base = MappedIndex(index_path)
+    if base.version != INDEX_VERSION:
+        base.close()
+        raise ValueError(f"{index_path} was written by another version, rebuild it first")
+    engine = InvertedIndex(trigrams=bool(base.flags & FLAG_TRIGRAMS))
+    engine.code_terms = bool(base.flags & FLAG_CODE_TERMS)
+    engine._attach(base)
+    return engine
+
+def run_batch(engine, queries, k=10, threads=1, out=sys.stdout):
+    """Run queries and write one JSON result per line, in input order.
+
+    With threads > 1 queries run concurrently against the shared index
+    (read-only: nothing is re-indexed in batch mode). Returns per-query
+    latencies in ms.
+    """
+    latencies = []
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for result in pool.map(lambda query: engine.run_query(query, k), queries):
+            latencies.append(result["took_ms"])
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    return latencies
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == '_'
+
+def _freeze(node):
+    """Hashable form of a parsed query node (lists become tuples)."""
+    if isinstance(node, (list, tuple)):
+        return tuple(_freeze(child) for child in node)
+    return node
+
+def _index_batch(paths, trigrams=False, code_terms=False):
+    """Worker entry point: build a partial index for a batch of files."""
+    partial = InvertedIndex(trigrams)
+    partial.code_terms = code_terms
+    for path in paths:
+        partial._index_file(path)
+    return partial
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
 
 def main():
+    parser = argparse.ArgumentParser(description="Local Search Engine")
+    parser.add_argument("directory", nargs='?', help="Directory to scan")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes for indexing (default: 1)")
+    parser.add_argument("--index", help=f"Index file (default: <directory>/{INDEX_FILENAME})")
+    parser.add_argument("-k", "--top", type=positive_int, default=10,
+                        help="Number of best-ranked files to show (default: 10)")
+    parser.add_argument("--trigrams", action="store_true",
+                        help="Also build a trigram index to speed up /regex/ queries")
+    parser.add_argument("--fuzzy", action="store_true",
+                        help="Typo-tolerant mode: unknown words also match similar terms")
+    parser.add_argument("--code-terms", action="store_true",
+                        help="Also index the camelCase/snake_case parts of identifiers")
+    parser.add_argument("--memory-mb", type=float,
+                        help="Memory budget for postings while indexing; beyond it sorted "
+                             "segments are spilled to disk and merged at the end")
+    parser.add_argument("--serve", action="store_true",
+                        help="Daemon mode: keep the index live and answer queries over HTTP")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="Port for --serve on 127.0.0.1 (default: 8765)")
+    parser.add_argument("--poll-interval", type=float, default=2.0,
+                        help="Seconds between change scans when watchdog is missing (default: 2)")
+    parser.add_argument("--batch", metavar="QUERIES",
+                        help="Run the queries in this file (one per line, '-' for stdin) against "
+                             "the saved index and print JSON lines instead of prompting")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Threads for --batch queries (default: 1)")
+    parser.add_argument("--stats-json", metavar="FILE",
+                        help="Write index/timing/query statistics as JSON to FILE on exit")
+    args = parser.parse_args()
+
+    if args.batch:
+        engine = batch_mode(args)
+        dump_stats(engine, args.stats_json)
+        return
+
     console.print(Panel("[bold white]Local Search Engine[/bold white]", style="magenta"))
     
-    # Default to parent of current dir (to scan sibling projects)
-    # But for safety/speed, let's ask or default to current.
-    # User might want to search all 365days.
-    default_path = os.path.abspath(os.path.join(os.getcwd(), ".."))
-    
-    target_dir = Prompt.ask("Directory to scan", default=default_path)
+    target_dir = args.directory
+    if not target_dir:
+        # Default to parent of current dir (to scan sibling projects)
+        # But for safety/speed, let's ask or default to current.
+        # User might want to search all 365days.
+        default_path = os.path.abspath(os.path.join(os.getcwd(), ".."))
+        target_dir = Prompt.ask("Directory to scan", default=default_path)
+    # Absolute, so stored paths (and daemon rescans) do not depend on the cwd
+    target_dir = os.path.abspath(target_dir)
     
-    engine = InvertedIndex()
-    engine.build_index(target_dir)
+    engine = InvertedIndex(trigrams=args.trigrams)
+    engine.fuzzy = args.fuzzy
+    engine.code_terms = args.code_terms
+    if args.memory_mb:
+        engine.memory_budget = int(args.memory_mb * 1024 * 1024)
+    # Index is saved inside the scanned folder and reused on the next run
+    index_path = args.index or os.path.join(target_dir, INDEX_FILENAME)
+    engine.build_index(target_dir, index_path=index_path, jobs=max(1, args.jobs))
+
+    if args.serve:
+        SearchDaemon(engine, target_dir, index_path, args.poll_interval).serve_forever(port=args.port)
+        dump_stats(engine, args.stats_json)
+        return
     
     while True:
-        query = Prompt.ask("\n[bold green]Search[/bold green] (or 'exit')")
+        query = Prompt.ask("\n[bold green]Search[/bold green] (':stats' or 'exit')")
         if query.lower() in ('exit', 'quit'):
             break
+        if query.strip() == ':stats':
+            display_stats(engine.stats())
+            continue
         
         results = engine.search(query)
-        engine.display_results(query, results)
+        engine.display_results(query, results, k=args.top)
+    dump_stats(engine, args.stats_json)
+
+def display_stats(stats):
+    table = Table(title="Index Statistics")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", justify="right")
+    table.add_row("Files", str(stats["files"]))
+    table.add_row("Vocabulary", str(stats["terms"]))
+    table.add_row("Postings", f"{stats['postings']} ({stats['postings_bytes'] / 1024:.1f} KB)")
+    table.add_row("Memory (est.)", f"{stats['memory_bytes'] / 1024:.1f} KB")
+    table.add_row("Index file", f"{stats['index_file_bytes'] / 1024:.1f} KB")
+    table.add_row("Bytes read", f"{stats['bytes_read'] / 1024:.1f} KB")
+    for phase, seconds in stats["phase_seconds"].items():
+        table.add_row(f"Time: {phase}", f"{seconds:.3f} s")
+    table.add_row("Queries", str(stats["queries"]))
+    for bucket, count in stats["query_latency_ms"].items():
+        if count:
+            table.add_row(f"  latency {bucket} ms", str(count))
+    table.add_row("Cache hit rate", f"{stats['cache']['hit_rate']:.0%}")
+    console.print(table)
+
+def dump_stats(engine, path):
+    if not path:
+        return
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(engine.stats(), f, indent=2)
+    except OSError as e:
+        console.print(f"[yellow]Could not write stats to {path}: {e}[/yellow]")
+
+def batch_mode(args):
+    # stdout carries the JSON lines, everything else goes to stderr
+    console.file = sys.stderr
+    if not args.index and not args.directory:
+        console.print("[red]--batch needs --index or a directory containing an index.[/red]")
+        sys.exit(2)
+    index_path = args.index or os.path.join(args.directory, INDEX_FILENAME)
+    try:
+        engine = open_index(index_path)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Could not open index {index_path}: {e}[/red]")
+        sys.exit(1)
+    engine.fuzzy = args.fuzzy
+
+    if args.batch == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(args.batch, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    queries = [line.strip() for line in lines if line.strip()]
+
+    start = time.perf_counter()
+    latencies = sorted(run_batch(engine, queries, args.top, max(1, args.threads)))
+    duration = time.perf_counter() - start
+    if latencies:
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        console.print(f"[green]{len(queries)} queries in {duration:.2f} seconds "
+                      f"({len(queries) / duration:.0f} queries/sec with {max(1, args.threads)} thread(s), "
+                      f"p50 {p50:.2f} ms, p95 {p95:.2f} ms).[/green]")
+    return engine
 
 if __name__ == "__main__":
     main()
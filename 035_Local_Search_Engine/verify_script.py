@@ -0,0 +1,54 @@
+import os
+import shutil
+from search_engine import InvertedIndex
+
+TEST_DIR = "test_search"
+
+# Regexes whose trigram prefilter once dropped real matches
+REGEX_QUERIES = [
+    "/ab{2}c/",
+    "/\\x41 zz/",
+    "/CAFÉ/",
+    "/CAFÉ/i",
+    "/[^]]abc/",
+    "/[]x]abc/",
+    "/(?x) z a b c/",
+    "/lait/i",
+]
+
+def setup_test_env():
+    if os.path.exists(TEST_DIR):
+        shutil.rmtree(TEST_DIR)
+    os.makedirs(TEST_DIR)
+
+    with open(os.path.join(TEST_DIR, "a.txt"), "w", encoding="utf-8") as f:
+        f.write("abbc\nCAFÉ au lait\nx A zz\nzabc ]xabc\n")
+
+    with open(os.path.join(TEST_DIR, "b.txt"), "w", encoding="utf-8") as f:
+        f.write("hello world\n")
+
+    print(f"Test environment created at: {os.path.abspath(TEST_DIR)}")
+
+def test_trigram_prefilter():
+    print("Building indexes with and without --trigrams...")
+    plain = InvertedIndex()
+    plain.build_index(TEST_DIR)
+    trigram = InvertedIndex(trigrams=True)
+    trigram.build_index(TEST_DIR)
+
+    print("\nVERIFICATION RESULTS:")
+    for query in REGEX_QUERIES:
+        expected = sorted(plain.search(query))
+        found = sorted(trigram.search(query))
+        if not expected:
+            print(f"[FAILED] {query} matches nothing, the test file is wrong.")
+        elif found == expected:
+            print(f"[PASSED] {query} finds the same {len(expected)} line(s) with trigrams.")
+        else:
+            print(f"[FAILED] {query}: {expected} without trigrams, {found} with trigrams.")
+
+if __name__ == "__main__":
+    setup_test_env()
+    test_trigram_prefilter()
+    # Cleanup
+    # shutil.rmtree(TEST_DIR)